@@ -1,2 +1,5 @@
 from app.api.routes.message_routes import router as message_router
-from app.api.routes.conversation_routes import router as conversation_router 
\ No newline at end of file
+from app.api.routes.conversation_routes import router as conversation_router
+from app.api.routes.admin_routes import router as admin_router
+from app.api.routes.user_routes import router as user_router
+from app.api.routes.attachment_routes import router as attachment_router 
\ No newline at end of file
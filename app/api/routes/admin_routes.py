@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Query
+from typing import Dict, Any
+
+from app.core.admission import admission_controller
+from app.core.hotkeys import hot_partitions
+from app.core import singleflight
+from app.models.cassandra_models import read_receipt_buffer, SearchIndexModel
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+@router.get("/admission")
+async def get_admission_state() -> Dict[str, Any]:
+    """
+    Get the current limit, queue depth and counters of every admission query class
+    """
+    return admission_controller.snapshot()
+
+@router.get("/search-index")
+async def get_search_index_state() -> Dict[str, Any]:
+    """
+    Get the pending, retried and failed counts of background search indexing, and the conversations to re-index
+    """
+    return SearchIndexModel.snapshot()
+
+@router.get("/read-receipts")
+async def get_read_receipt_buffer_state() -> Dict[str, Any]:
+    """
+    Get the pending, coalesced and written counts of the read receipt buffer
+    """
+    return read_receipt_buffer.snapshot()
+
+@router.get("/hot-partitions")
+async def get_hot_partitions(
+    limit: int = Query(10, ge=1, le=100, description="Partitions listed per table and operation")
+) -> Dict[str, Any]:
+    """
+    Get the most accessed partitions and their read/write rates, for the current and the last complete window
+    """
+    return hot_partitions.snapshot(limit)
+
+@router.get("/single-flight")
+async def get_single_flight_metrics() -> Dict[str, Any]:
+    """
+    Get the call, execution and coalescing counts of every single-flight model read
+    """
+    return singleflight.snapshot()
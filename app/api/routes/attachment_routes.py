@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Path, Request
+from fastapi.responses import FileResponse
+
+from app.controllers.attachment_controller import AttachmentController, DEFAULT_CONTENT_TYPE
+from app.schemas.attachment import AttachmentResponse
+
+router = APIRouter(prefix="/api/attachments", tags=["Attachments"])
+
+@router.post("/", response_model=AttachmentResponse, status_code=201)
+async def upload_attachment(
+    request: Request,
+    attachment_controller: AttachmentController = Depends()
+) -> AttachmentResponse:
+    """
+    Upload an attachment as the raw request body (chunked transfer encoding is supported)
+    """
+    return await attachment_controller.upload_attachment(
+        chunks=request.stream(),
+        content_type=request.headers.get("content-type") or DEFAULT_CONTENT_TYPE
+    )
+
+@router.get("/{attachment_id}", response_class=FileResponse)
+async def download_attachment(
+    attachment_id: str = Path(..., description="ID of the attachment"),
+    attachment_controller: AttachmentController = Depends()
+) -> FileResponse:
+    """
+    Download an attachment; supports Range requests
+    """
+    return await attachment_controller.download_attachment(attachment_id) 
\ No newline at end of file
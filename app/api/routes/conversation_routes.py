@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, Query, Path
+from fastapi import APIRouter, Depends, Query, Path, Body
 
 from app.controllers.conversation_controller import ConversationController
 from app.schemas.conversation import (
     ConversationResponse,
-    PaginatedConversationResponse
+    PaginatedConversationResponse,
+    ConversationRetentionUpdate,
+    ConversationRetentionResponse,
+    GroupCreate,
+    GroupParticipantsResponse
 )
 
 router = APIRouter(prefix="/api/conversations", tags=["Conversations"])
@@ -24,6 +28,30 @@ async def get_user_conversations(
         limit=limit
     )
 
+@router.post("/groups", response_model=ConversationResponse, status_code=201)
+async def create_group(
+    group: GroupCreate = Body(...),
+    conversation_controller: ConversationController = Depends()
+) -> ConversationResponse:
+    """
+    Create a group conversation
+    """
+    return await conversation_controller.create_group(
+        creator_id=group.creator_id,
+        name=group.name,
+        member_ids=group.member_ids
+    )
+
+@router.get("/{conversation_id}/participants", response_model=GroupParticipantsResponse)
+async def get_group_participants(
+    conversation_id: int = Path(..., description="ID of the group conversation"),
+    conversation_controller: ConversationController = Depends()
+) -> GroupParticipantsResponse:
+    """
+    Get the members of a group conversation
+    """
+    return await conversation_controller.get_group_participants(conversation_id=conversation_id)
+
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: int = Path(..., description="ID of the conversation"),
@@ -32,4 +60,18 @@ async def get_conversation(
     """
     Get a specific conversation by ID
     """
-    return await conversation_controller.get_conversation(conversation_id=conversation_id) 
\ No newline at end of file
+    return await conversation_controller.get_conversation(conversation_id=conversation_id)
+
+@router.put("/{conversation_id}/retention", response_model=ConversationRetentionResponse)
+async def set_conversation_retention(
+    conversation_id: int = Path(..., description="ID of the conversation"),
+    retention: ConversationRetentionUpdate = Body(...),
+    conversation_controller: ConversationController = Depends()
+) -> ConversationRetentionResponse:
+    """
+    Set how long new messages in a conversation are kept
+    """
+    return await conversation_controller.set_conversation_retention(
+        conversation_id=conversation_id,
+        retention_seconds=retention.retention_seconds
+    ) 
\ No newline at end of file
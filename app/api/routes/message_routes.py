@@ -3,10 +3,13 @@ from typing import Optional
 from datetime import datetime
 
 from app.controllers.message_controller import MessageController
+from app.models.cassandra_models import SearchIndexModel
 from app.schemas.message import (
     MessageCreate, 
     MessageResponse, 
-    PaginatedMessageResponse
+    PaginatedMessageResponse,
+    MarkReadRequest,
+    ReadReceiptResponse
 )
 
 router = APIRouter(prefix="/api/messages", tags=["Messages"])
@@ -53,4 +56,53 @@ async def get_messages_before_timestamp(
         before_timestamp=before_timestamp,
         page=page,
         limit=limit
+    )
+
+@router.post("/conversation/{conversation_id}/read", response_model=ReadReceiptResponse, status_code=202)
+async def mark_conversation_read(
+    conversation_id: int = Path(..., description="ID of the conversation"),
+    request: MarkReadRequest = Body(...),
+    message_controller: MessageController = Depends()
+) -> ReadReceiptResponse:
+    """
+    Mark a conversation as read by a user up to a message
+    """
+    return await message_controller.mark_read(conversation_id, request)
+
+@router.get("/conversation/{conversation_id}/search", response_model=PaginatedMessageResponse)
+async def search_conversation_messages(
+    conversation_id: int = Path(..., description="ID of the conversation"),
+    q: str = Query(..., min_length=1, description="Search text"),
+    page: int = Query(1, description="Page number"),
+    limit: int = Query(20, description="Number of messages per page"),
+    message_controller: MessageController = Depends()
+) -> PaginatedMessageResponse:
+    """
+    Search message content within a conversation
+    """
+    return await message_controller.search_messages(
+        scope=SearchIndexModel.CONVERSATION_SCOPE,
+        scope_id=conversation_id,
+        query=q,
+        page=page,
+        limit=limit
+    )
+
+@router.get("/user/{user_id}/search", response_model=PaginatedMessageResponse)
+async def search_user_messages(
+    user_id: int = Path(..., description="ID of the user"),
+    q: str = Query(..., min_length=1, description="Search text"),
+    page: int = Query(1, description="Page number"),
+    limit: int = Query(20, description="Number of messages per page"),
+    message_controller: MessageController = Depends()
+) -> PaginatedMessageResponse:
+    """
+    Search message content across all of a user's conversations
+    """
+    return await message_controller.search_messages(
+        scope=SearchIndexModel.USER_SCOPE,
+        scope_id=user_id,
+        query=q,
+        page=page,
+        limit=limit
     ) 
\ No newline at end of file
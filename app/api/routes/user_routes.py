@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query, Path
+from typing import Optional
+
+from app.controllers.feed_controller import FeedController
+from app.schemas.message import FeedResponse
+
+router = APIRouter(prefix="/api/users", tags=["Users"])
+
+@router.get("/{user_id}/feed", response_model=FeedResponse)
+async def get_user_feed(
+    user_id: int = Path(..., description="ID of the user"),
+    limit: int = Query(20, ge=1, le=100, description="Number of messages per page"),
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    feed_controller: FeedController = Depends()
+) -> FeedResponse:
+    """
+    Get the newest messages across all of a user's conversations
+    """
+    return await feed_controller.get_user_feed(
+        user_id=user_id,
+        limit=limit,
+        cursor=cursor
+    ) 
\ No newline at end of file
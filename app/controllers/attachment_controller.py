@@ -0,0 +1,120 @@
+from typing import AsyncIterator
+from datetime import datetime
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse
+import logging
+
+from app.schemas.attachment import AttachmentResponse
+from app.models.cassandra_models import AttachmentModel
+from app.core.blobstore import blob_store, is_blob_id, BlobTooLarge, EmptyBlob
+from app.core.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+class AttachmentController:
+    """
+    Controller for uploading and downloading message attachments
+    """
+
+    async def upload_attachment(self, chunks: AsyncIterator[bytes], content_type: str) -> AttachmentResponse:
+        """
+        Stream an attachment into the blob store
+
+        The body is written to disk chunk by chunk while it is hashed, so it
+        is never held in memory. Content that is already stored is not
+        written again.
+
+        Args:
+            chunks: Request body stream
+            content_type: Media type of the attachment
+
+        Returns:
+            The attachment's ID and metadata
+
+        Raises:
+            HTTPException: If the attachment is empty or too large
+        """
+        try:
+            with trace_span('write'):
+                try:
+                    stored = await blob_store.save_stream(chunks)
+                except BlobTooLarge as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=str(e)
+                    )
+                except EmptyBlob as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
+                existing = await AttachmentModel.get_attachment(stored.blob_id) if stored.deduplicated else None
+                if existing:
+                    created_at = existing['created_at']
+                    content_type = existing['content_type']
+                else:
+                    created_at = datetime.utcnow()
+                    await AttachmentModel.save_attachment(stored.blob_id, stored.size, content_type, created_at)
+            return AttachmentResponse(
+                id=stored.blob_id,
+                size=stored.size,
+                content_type=content_type,
+                created_at=created_at,
+                deduplicated=stored.deduplicated
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in upload_attachment: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
+
+    async def download_attachment(self, attachment_id: str) -> FileResponse:
+        """
+        Serve an attachment from disk
+
+        The file is streamed by the server with Range support; blobs are
+        immutable, so responses can be cached indefinitely.
+
+        Args:
+            attachment_id: ID of the attachment
+
+        Returns:
+            File response for the blob
+
+        Raises:
+            HTTPException: If the attachment is not found
+        """
+        try:
+            if not is_blob_id(attachment_id):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Attachment not found"
+                )
+            with trace_span('fetch'):
+                attachment = await AttachmentModel.get_attachment(attachment_id)
+            if not attachment or not blob_store.exists(attachment_id):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Attachment not found"
+                )
+            return FileResponse(
+                blob_store.path(attachment_id),
+                media_type=attachment.get('content_type') or DEFAULT_CONTENT_TYPE,
+                headers={
+                    'Cache-Control': 'private, max-age=31536000, immutable',
+                    'ETag': f'"{attachment_id}"'
+                }
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in download_attachment: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
\ No newline at end of file
@@ -1,8 +1,16 @@
+from typing import List
 from fastapi import HTTPException, status
+import asyncio
 import logging
 
-from app.schemas.conversation import ConversationResponse, PaginatedConversationResponse
-from app.models.cassandra_models import ConversationModel
+from app.schemas.conversation import (
+    ConversationResponse,
+    PaginatedConversationResponse,
+    ConversationRetentionResponse,
+    GroupParticipantsResponse
+)
+from app.models.cassandra_models import ConversationModel, GroupModel, CounterModel
+from app.core.tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
@@ -33,27 +41,35 @@ class ConversationController:
             HTTPException: If user not found or access denied
         """
         try:
-            rows = await ConversationModel.get_user_conversations(user_id, page, limit)
+            with trace_span('fetch'):
+                rows, total = await asyncio.gather(
+                    ConversationModel.get_user_conversations(user_id, page, limit),
+                    CounterModel.get_conversation_count(user_id)
+                )
             logger.info(f"Fetched user_conversations for user_id={user_id}: {rows}")
-            total = len(rows)
             data = []
-            for row in rows:
-                try:
-                    data.append(ConversationResponse(
-                        id=row.get('conversation_id'),
-                        user1_id=None,  # Not available in user_conversations, can be fetched if needed
-                        user2_id=row.get('other_user_id'),
-                        last_message_at=row.get('last_message_at'),
-                        last_message_content=row.get('last_message_content')
-                    ))
-                except Exception as e:
-                    logger.error(f"Error building ConversationResponse for row: {row}\n{e}")
+            with trace_span('build'):
+                for row in rows:
+                    try:
+                        data.append(ConversationResponse(
+                            id=row.get('conversation_id'),
+                            user1_id=None,  # Not available in user_conversations, can be fetched if needed
+                            user2_id=row.get('other_user_id'),
+                            last_message_at=row.get('last_message_at'),
+                            last_message_content=row.get('last_message_content'),
+                            is_group=bool(row.get('is_group')),
+                            name=row.get('name')
+                        ))
+                    except Exception as e:
+                        logger.error(f"Error building ConversationResponse for row: {row}\n{e}")
             return PaginatedConversationResponse(
                 total=total,
                 page=page,
                 limit=limit,
                 data=data
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception in get_user_conversations: {e}", exc_info=True)
             raise HTTPException(
@@ -75,7 +91,8 @@ class ConversationController:
             HTTPException: If conversation not found or access denied
         """
         try:
-            row = await ConversationModel.get_conversation(conversation_id)
+            with trace_span('fetch'):
+                row = await ConversationModel.get_conversation(conversation_id)
             logger.info(f"Fetched conversation for conversation_id={conversation_id}: {row}")
             if not row:
                 raise HTTPException(
@@ -87,12 +104,127 @@ class ConversationController:
                 user1_id=row.get('user1_id'),
                 user2_id=row.get('user2_id'),
                 last_message_at=row.get('last_message_at'),
-                last_message_content=row.get('last_message_content')
+                last_message_content=row.get('last_message_content'),
+                is_group=bool(row.get('is_group')),
+                name=row.get('name')
             )
         except HTTPException:
             raise
         except Exception as e:
             logger.error(f"Exception in get_conversation: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
+
+    async def set_conversation_retention(self, conversation_id: int, retention_seconds: int) -> ConversationRetentionResponse:
+        """
+        Set how long new messages in a conversation are kept
+
+        Args:
+            conversation_id: ID of the conversation
+            retention_seconds: Retention in seconds, 0 to keep messages forever
+
+        Returns:
+            The updated retention setting
+
+        Raises:
+            HTTPException: If conversation not found
+        """
+        try:
+            with trace_span('fetch'):
+                row = await ConversationModel.get_conversation(conversation_id)
+            if not row:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Conversation not found"
+                )
+            await ConversationModel.set_retention(conversation_id, retention_seconds)
+            logger.info(f"Set retention for conversation_id={conversation_id} to {retention_seconds}s")
+            return ConversationRetentionResponse(
+                conversation_id=conversation_id,
+                retention_seconds=retention_seconds
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in set_conversation_retention: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
+
+    async def create_group(self, creator_id: int, name: str, member_ids: List[int]) -> ConversationResponse:
+        """
+        Create a group conversation
+
+        Args:
+            creator_id: ID of the user creating the group
+            name: Name of the group
+            member_ids: IDs of the other members
+
+        Returns:
+            The created group conversation
+
+        Raises:
+            HTTPException: If group creation fails
+        """
+        try:
+            with trace_span('write'):
+                group = await GroupModel.create_group(creator_id, name, member_ids)
+            logger.info(
+                f"Created group conversation_id={group['conversation_id']} with "
+                f"{len(group['participants'])} members (fan-out on {group['fanout_mode']})"
+            )
+            return ConversationResponse(
+                id=group['conversation_id'],
+                user1_id=creator_id,
+                user2_id=None,
+                last_message_at=group['created_at'],
+                last_message_content=None,
+                is_group=True,
+                name=name
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in create_group: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
+
+    async def get_group_participants(self, conversation_id: int) -> GroupParticipantsResponse:
+        """
+        Get the members of a group conversation
+
+        Args:
+            conversation_id: ID of the group conversation
+
+        Returns:
+            The group's members and fan-out mode
+
+        Raises:
+            HTTPException: If group not found
+        """
+        try:
+            with trace_span('fetch'):
+                row = await ConversationModel.get_conversation(conversation_id)
+                if not row or not row.get('is_group'):
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Group conversation not found"
+                    )
+                participants = await GroupModel.get_participants(conversation_id)
+            return GroupParticipantsResponse(
+                conversation_id=conversation_id,
+                fanout_mode=row.get('fanout_mode') or GroupModel.fanout_mode_for(len(participants)),
+                participants=participants
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in get_group_participants: {e}", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Internal server error: {str(e)}"
@@ -0,0 +1,164 @@
+from typing import Optional, Dict, List
+from collections import deque
+from fastapi import HTTPException, status
+import os
+import json
+import heapq
+import base64
+import asyncio
+import logging
+
+from app.schemas.message import MessageResponse, FeedResponse
+from app.models.cassandra_models import MessageModel, ConversationModel
+from app.core.archive import to_millis, from_millis
+from app.core.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+FEED_MAX_CONVERSATIONS = int(os.getenv("FEED_MAX_CONVERSATIONS", "50"))
+FEED_MIN_BATCH = int(os.getenv("FEED_MIN_BATCH", "2"))
+FEED_MAX_BATCH = int(os.getenv("FEED_MAX_BATCH", "100"))
+
+class _PartitionStream:
+    """
+    Lazily paged, newest-first view of one conversation's messages.
+
+    The position is (created_at_ms, seen) where seen counts the rows already
+    consumed at exactly that timestamp, so ties are resumed without needing
+    an ordering over message IDs.
+    """
+
+    def __init__(self, conversation_id: int, position: Optional[List[int]], batch: int):
+        self.conversation_id = conversation_id
+        self.position = position
+        self.batch = batch
+        self.buffer = deque()
+        self.exhausted = False
+
+    async def fill(self) -> None:
+        up_to = from_millis(self.position[0]) if self.position else None
+        skip = self.position[1] if self.position else 0
+        rows = await MessageModel.get_messages_up_to(self.conversation_id, up_to, self.batch + skip)
+        self.exhausted = len(rows) < self.batch + skip
+        for row in rows:
+            if skip and to_millis(row['created_at']) == self.position[0]:
+                skip -= 1
+                continue
+            self.buffer.append(row)
+        # Grow the next fetch geometrically so a busy conversation costs O(log n) round trips
+        self.batch = min(self.batch * 2, FEED_MAX_BATCH)
+
+    def advance(self, row) -> None:
+        created_ms = to_millis(row['created_at'])
+        if self.position and self.position[0] == created_ms:
+            self.position = [created_ms, self.position[1] + 1]
+        else:
+            self.position = [created_ms, 1]
+
+    @property
+    def done(self) -> bool:
+        return self.exhausted and not self.buffer
+
+def _encode_cursor(positions: Dict[int, Optional[List[int]]]) -> Optional[str]:
+    if all(position == 0 for position in positions.values()):
+        return None
+    raw = json.dumps({'p': {str(cid): p for cid, p in positions.items()}}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_cursor(cursor: str) -> Dict[int, Optional[List[int]]]:
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+    return {int(cid): position for cid, position in json.loads(raw)['p'].items()}
+
+class FeedController:
+    """
+    Controller for the cross-conversation activity feed
+    """
+
+    async def get_user_feed(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> FeedResponse:
+        """
+        Get the newest messages across a user's conversations
+
+        The user's most recent conversations are read from user_conversations
+        and their newest messages fetched concurrently, then merged lazily with
+        a heap. A conversation is only queried again once its buffered rows
+        have been consumed, so a page costs O(limit) rows plus one small
+        fetch per conversation.
+
+        Args:
+            user_id: ID of the user
+            limit: Number of messages per page
+            cursor: Cursor returned by the previous page
+
+        Returns:
+            A page of messages, newest first, with the cursor for the next page
+
+        Raises:
+            HTTPException: If the cursor is invalid
+        """
+        try:
+            if cursor:
+                try:
+                    positions = _decode_cursor(cursor)
+                except Exception:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid cursor"
+                    )
+            else:
+                rows = await ConversationModel.get_user_conversations(user_id, 1, FEED_MAX_CONVERSATIONS)
+                positions = {}
+                for row in rows:
+                    positions.setdefault(row['conversation_id'], None)
+            # Conversations marked 0 in the cursor are exhausted
+            live = {cid: position for cid, position in positions.items() if position != 0}
+            batch = max(FEED_MIN_BATCH, -(-limit // max(len(live), 1)) + 1)
+            streams = [_PartitionStream(cid, position, batch) for cid, position in live.items()]
+            with trace_span('fetch'):
+                await asyncio.gather(*[s.fill() for s in streams])
+
+            with trace_span('merge'):
+                heap = []
+                for index, stream in enumerate(streams):
+                    if stream.buffer:
+                        heapq.heappush(heap, (-to_millis(stream.buffer[0]['created_at']), index))
+                data = []
+                while heap and len(data) < limit:
+                    _, index = heapq.heappop(heap)
+                    stream = streams[index]
+                    row = stream.buffer.popleft()
+                    stream.advance(row)
+                    data.append(MessageResponse(
+                        id=str(row.get('message_id')),
+                        sender_id=row.get('sender_id'),
+                        receiver_id=row.get('receiver_id'),
+                        content=row.get('content'),
+                        created_at=row.get('created_at'),
+                        conversation_id=row.get('conversation_id'),
+                        attachment_id=row.get('attachment_id')
+                    ))
+                    if not stream.buffer and not stream.exhausted and len(data) < limit:
+                        await stream.fill()
+                    if stream.buffer:
+                        heapq.heappush(heap, (-to_millis(stream.buffer[0]['created_at']), index))
+
+            for stream in streams:
+                positions[stream.conversation_id] = 0 if stream.done else stream.position
+            logger.info(f"Feed for user_id={user_id}: {len(data)} messages from {len(streams)} conversations")
+            return FeedResponse(
+                limit=limit,
+                next_cursor=_encode_cursor(positions),
+                data=data
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in get_user_feed: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
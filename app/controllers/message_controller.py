@@ -1,12 +1,20 @@
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 from fastapi import HTTPException, status
+import uuid
 import asyncio
 import logging
 
-from app.schemas.message import MessageCreate, MessageResponse, PaginatedMessageResponse
-from app.models.cassandra_models import MessageModel, ConversationModel
-from app.db.cassandra_client import cassandra_client
+from app.schemas.message import (
+    MessageCreate, MessageResponse, PaginatedMessageResponse, MarkReadRequest, ReadReceiptResponse
+)
+from app.models.cassandra_models import (
+    MessageModel, ConversationModel, SearchIndexModel, GroupModel, ReadReceiptModel, AttachmentModel, CounterModel,
+    read_receipt_buffer
+)
+from app.core.blobstore import is_blob_id
+from app.core.archive import to_millis, from_millis
+from app.core.tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +26,10 @@ class MessageController:
     
     async def send_message(self, message_data: MessageCreate) -> MessageResponse:
         """
-        Send a message from one user to another
+        Send a message from one user to another, or to a group
         
         Args:
-            message_data: The message data including content, sender_id, and receiver_id
+            message_data: The message data including content, sender_id, and receiver_id or conversation_id
             
         Returns:
             The created message with metadata
@@ -30,53 +38,47 @@ class MessageController:
             HTTPException: If message sending fails
         """
         try:
+            if message_data.attachment_id is not None:
+                await self._check_attachment(message_data.attachment_id)
+            if message_data.conversation_id is not None:
+                return await self._send_group_message(message_data)
             # Find or create the conversation
-            conversation_id = await ConversationModel.create_or_get_conversation(
-                message_data.sender_id, message_data.receiver_id
-            )
+            with trace_span('fetch'):
+                conversation_id, previous_message_at, created = await ConversationModel.create_or_get_conversation(
+                    message_data.sender_id, message_data.receiver_id
+                )
             now = datetime.utcnow()
-            message_id = await MessageModel.create_message(
-                conversation_id=conversation_id,
-                sender_id=message_data.sender_id,
-                receiver_id=message_data.receiver_id,
-                content=message_data.content,
-                created_at=now
-            )
-            # Update conversation metadata (last_message_at, last_message_content)
-            update_query = '''
-                UPDATE conversations SET last_message_at = %(last_message_at)s, last_message_content = %(last_message_content)s WHERE conversation_id = %(conversation_id)s
-            '''
-            update_params = {
-                'last_message_at': now,
-                'last_message_content': message_data.content,
-                'conversation_id': conversation_id
-            }
-            await asyncio.get_event_loop().run_in_executor(None, cassandra_client.execute, update_query, update_params)
-            # Also update user_conversations for both users
-            for uid, oid in [
-                (message_data.sender_id, message_data.receiver_id),
-                (message_data.receiver_id, message_data.sender_id)
-            ]:
-                upsert_user_conv = '''
-                    INSERT INTO user_conversations (user_id, conversation_id, other_user_id, last_message_at, last_message_content)
-                    VALUES (%(user_id)s, %(conversation_id)s, %(other_user_id)s, %(last_message_at)s, %(last_message_content)s)
-                '''
-                upsert_params = {
-                    'user_id': uid,
-                    'conversation_id': conversation_id,
-                    'other_user_id': oid,
-                    'last_message_at': now,
-                    'last_message_content': message_data.content
-                }
-                await asyncio.get_event_loop().run_in_executor(None, cassandra_client.execute, upsert_user_conv, upsert_params)
+            with trace_span('write'):
+                message_id = await MessageModel.create_message(
+                    conversation_id=conversation_id,
+                    sender_id=message_data.sender_id,
+                    receiver_id=message_data.receiver_id,
+                    content=message_data.content,
+                    created_at=now,
+                    attachment_id=message_data.attachment_id
+                )
+                await ConversationModel.update_last_message(
+                    conversation_id=conversation_id,
+                    sender_id=message_data.sender_id,
+                    receiver_id=message_data.receiver_id,
+                    content=message_data.content,
+                    last_message_at=now,
+                    # A new conversation has no inbox rows yet
+                    previous_message_at=None if created else previous_message_at
+                )
+                new_conversation_users = list({message_data.sender_id, message_data.receiver_id}) if created else []
+                await CounterModel.record_message(conversation_id, new_conversation_users)
             return MessageResponse(
                 id=str(message_id),
                 sender_id=message_data.sender_id,
                 receiver_id=message_data.receiver_id,
                 content=message_data.content,
                 created_at=now,
-                conversation_id=conversation_id
+                conversation_id=conversation_id,
+                attachment_id=message_data.attachment_id
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception in send_message: {e}", exc_info=True)
             raise HTTPException(
@@ -84,6 +86,56 @@ class MessageController:
                 detail=f"Internal server error: {str(e)}"
             )
     
+    async def _check_attachment(self, attachment_id: str) -> None:
+        """Reject messages that reference an attachment which was never uploaded."""
+        with trace_span('fetch'):
+            if not is_blob_id(attachment_id) or not await AttachmentModel.get_attachment(attachment_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Unknown attachment_id"
+                )
+
+    async def _send_group_message(self, message_data: MessageCreate) -> MessageResponse:
+        """
+        Send a message to a group conversation
+
+        Small groups push the message into every member's inbox row; large
+        groups only update the conversation and are merged in at read time.
+        """
+        with trace_span('fetch'):
+            group = await ConversationModel.get_conversation(message_data.conversation_id)
+            if not group or not group.get('is_group'):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Group conversation not found"
+                )
+            if not await GroupModel.is_participant(message_data.conversation_id, message_data.sender_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Sender is not a member of this group"
+                )
+        now = datetime.utcnow()
+        with trace_span('write'):
+            message_id = await MessageModel.create_message(
+                conversation_id=message_data.conversation_id,
+                sender_id=message_data.sender_id,
+                receiver_id=None,
+                content=message_data.content,
+                created_at=now,
+                attachment_id=message_data.attachment_id
+            )
+            await GroupModel.update_last_message(group, message_data.content, now)
+            await CounterModel.record_message(message_data.conversation_id)
+        return MessageResponse(
+            id=str(message_id),
+            sender_id=message_data.sender_id,
+            receiver_id=None,
+            content=message_data.content,
+            created_at=now,
+            conversation_id=message_data.conversation_id,
+            attachment_id=message_data.attachment_id
+        )
+    
     async def get_conversation_messages(
         self, 
         conversation_id: int, 
@@ -105,28 +157,37 @@ class MessageController:
             HTTPException: If conversation not found or access denied
         """
         try:
-            rows = await MessageModel.get_conversation_messages(conversation_id, page, limit)
+            with trace_span('fetch'):
+                rows, receipts, total = await asyncio.gather(
+                    MessageModel.get_conversation_messages(conversation_id, page, limit),
+                    ReadReceiptModel.get_watermarks(conversation_id),
+                    CounterModel.get_message_count(conversation_id)
+                )
             logger.info(f"Fetched messages for conversation_id={conversation_id}: {rows}")
-            total = len(rows)
             data = []
-            for row in rows:
-                try:
-                    data.append(MessageResponse(
-                        id=str(row.get('message_id')),
-                        sender_id=row.get('sender_id'),
-                        receiver_id=row.get('receiver_id'),
-                        content=row.get('content'),
-                        created_at=row.get('created_at'),
-                        conversation_id=row.get('conversation_id')
-                    ))
-                except Exception as e:
-                    logger.error(f"Error building MessageResponse for row: {row}\n{e}")
+            with trace_span('build'):
+                for row in rows:
+                    try:
+                        data.append(MessageResponse(
+                            id=str(row.get('message_id')),
+                            sender_id=row.get('sender_id'),
+                            receiver_id=row.get('receiver_id'),
+                            content=row.get('content'),
+                            created_at=row.get('created_at'),
+                            conversation_id=row.get('conversation_id'),
+                            attachment_id=row.get('attachment_id')
+                        ))
+                    except Exception as e:
+                        logger.error(f"Error building MessageResponse for row: {row}\n{e}")
             return PaginatedMessageResponse(
                 total=total,
                 page=page,
                 limit=limit,
-                data=data
+                data=data,
+                read_receipts=self._build_receipts(conversation_id, receipts)
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception in get_conversation_messages: {e}", exc_info=True)
             raise HTTPException(
@@ -157,31 +218,173 @@ class MessageController:
             HTTPException: If conversation not found or access denied
         """
         try:
-            rows = await MessageModel.get_messages_before_timestamp(conversation_id, before_timestamp, page, limit)
+            with trace_span('fetch'):
+                rows, receipts, total = await asyncio.gather(
+                    MessageModel.get_messages_before_timestamp(conversation_id, before_timestamp, page, limit),
+                    ReadReceiptModel.get_watermarks(conversation_id),
+                    CounterModel.get_message_count(conversation_id)
+                )
             logger.info(f"Fetched messages before timestamp for conversation_id={conversation_id}: {rows}")
-            total = len(rows)
             data = []
-            for row in rows:
-                try:
-                    data.append(MessageResponse(
-                        id=str(row.get('message_id')),
-                        sender_id=row.get('sender_id'),
-                        receiver_id=row.get('receiver_id'),
-                        content=row.get('content'),
-                        created_at=row.get('created_at'),
-                        conversation_id=row.get('conversation_id')
-                    ))
-                except Exception as e:
-                    logger.error(f"Error building MessageResponse for row: {row}\n{e}")
+            with trace_span('build'):
+                for row in rows:
+                    try:
+                        data.append(MessageResponse(
+                            id=str(row.get('message_id')),
+                            sender_id=row.get('sender_id'),
+                            receiver_id=row.get('receiver_id'),
+                            content=row.get('content'),
+                            created_at=row.get('created_at'),
+                            conversation_id=row.get('conversation_id'),
+                            attachment_id=row.get('attachment_id')
+                        ))
+                    except Exception as e:
+                        logger.error(f"Error building MessageResponse for row: {row}\n{e}")
             return PaginatedMessageResponse(
                 total=total,
                 page=page,
                 limit=limit,
-                data=data
+                data=data,
+                read_receipts=self._build_receipts(conversation_id, receipts)
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception in get_messages_before_timestamp: {e}", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Internal server error: {str(e)}"
-            ) 
\ No newline at end of file
+            )
+
+    async def search_messages(
+        self,
+        scope: str,
+        scope_id: int,
+        query: str,
+        page: int = 1,
+        limit: int = 20
+    ) -> PaginatedMessageResponse:
+        """
+        Search message content within a conversation or across a user's conversations
+
+        Args:
+            scope: Either 'conversation' or 'user'
+            scope_id: ID of the conversation or user
+            query: Search text; every token must match
+            page: Page number
+            limit: Number of messages per page
+
+        Returns:
+            Paginated list of matching messages, newest first
+
+        Raises:
+            HTTPException: If the search fails
+        """
+        try:
+            with trace_span('fetch'):
+                rows = await SearchIndexModel.search_messages(scope, scope_id, query, page, limit)
+            logger.info(f"Search {scope}={scope_id} query={query!r} returned {len(rows)} messages")
+            data = []
+            with trace_span('build'):
+                for row in rows:
+                    try:
+                        data.append(MessageResponse(
+                            id=str(row.get('message_id')),
+                            sender_id=row.get('sender_id'),
+                            receiver_id=row.get('receiver_id'),
+                            content=row.get('content'),
+                            created_at=row.get('created_at'),
+                            conversation_id=row.get('conversation_id'),
+                            attachment_id=row.get('attachment_id')
+                        ))
+                    except Exception as e:
+                        logger.error(f"Error building MessageResponse for row: {row}\n{e}")
+            return PaginatedMessageResponse(
+                total=len(data),
+                page=page,
+                limit=limit,
+                data=data
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in search_messages: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            ) 
+
+    @staticmethod
+    def _build_receipts(conversation_id: int, rows) -> List[ReadReceiptResponse]:
+        return [
+            ReadReceiptResponse(
+                conversation_id=conversation_id,
+                user_id=row['user_id'],
+                last_read_message_id=str(row['last_read_message_id']),
+                last_read_at=row['last_read_at']
+            )
+            for row in rows
+        ]
+
+    async def mark_read(self, conversation_id: int, request: MarkReadRequest) -> ReadReceiptResponse:
+        """
+        Move a user's read watermark in a conversation up to a message
+
+        The message must exist in the conversation; the watermark is taken
+        from the stored row, buffered in memory and written in the next
+        periodic batch. Watermarks behind the user's current one are ignored.
+
+        Args:
+            conversation_id: ID of the conversation
+            request: User and the last message they have read
+
+        Returns:
+            The user's read watermark after the update
+
+        Raises:
+            HTTPException: If the message ID is invalid, the timestamp is in the future
+                or the message does not exist
+        """
+        try:
+            try:
+                message_id = uuid.UUID(request.message_id)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid message_id"
+                )
+            # Stored timestamps are naive UTC at millisecond precision
+            created_at = from_millis(to_millis(request.created_at))
+            if created_at > datetime.utcnow():
+                # Would become the receipt's write timestamp and shadow every later watermark
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="created_at is in the future"
+                )
+            with trace_span('fetch'):
+                message = await MessageModel.get_message(conversation_id, created_at, message_id)
+            if message is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Message not found"
+                )
+            if ReadReceiptModel.mark_read(conversation_id, request.user_id, message['created_at'], message['message_id']):
+                created_at, message_id = read_receipt_buffer.current((conversation_id, request.user_id))
+            else:
+                # Behind the current watermark: report the one that stands
+                with trace_span('fetch'):
+                    created_at, message_id = await ReadReceiptModel.get_watermark(conversation_id, request.user_id)
+            return ReadReceiptResponse(
+                conversation_id=conversation_id,
+                user_id=request.user_id,
+                last_read_message_id=str(message_id),
+                last_read_at=created_at
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in mark_read: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Internal server error: {str(e)}"
+            )
\ No newline at end of file
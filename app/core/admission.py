@@ -0,0 +1,218 @@
+"""
+Admission control for Cassandra-bound requests.
+Each query class gets its own adaptive concurrency limit (AIMD on observed
+latency) and a bounded wait queue. Requests that cannot be queued, or that
+wait too long, are rejected with 503 and a Retry-After hint.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from fastapi import HTTPException, status
+from cassandra import OperationTimedOut, ReadTimeout, WriteTimeout, Unavailable
+
+logger = logging.getLogger(__name__)
+
+# Defaults for every query class; override per class with ADMISSION_<CLASS>_<SETTING>
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "8"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "1"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))  # seconds, 0 = wait forever
+ADMISSION_TARGET_LATENCY_MS = float(os.getenv("ADMISSION_TARGET_LATENCY_MS", "50"))
+ADMISSION_DECREASE_FACTOR = float(os.getenv("ADMISSION_DECREASE_FACTOR", "0.9"))
+
+# Built-in per-class defaults; search index writes fan out to many small inserts per message,
+# and conversation writes to one row per member for groups of up to GROUP_FANOUT_WRITE_MAX_MEMBERS
+QUERY_CLASS_DEFAULTS = {
+    'search_write': {'MAX_LIMIT': 64, 'MAX_QUEUE': 1024},
+    'conversation_write': {'MAX_LIMIT': 64, 'MAX_QUEUE': 512}
+}
+
+# Driver errors that indicate the cluster is overloaded rather than a bad query
+CONGESTION_ERRORS = (OperationTimedOut, ReadTimeout, WriteTimeout, Unavailable)
+
+def _setting(query_class: str, name: str, default):
+    default = QUERY_CLASS_DEFAULTS.get(query_class, {}).get(name, default)
+    value = os.getenv(f"ADMISSION_{query_class.upper()}_{name}")
+    return type(default)(value) if value is not None else default
+
+class AdmissionRejected(HTTPException):
+    """Raised when a query class is saturated. Rendered as 503 with Retry-After."""
+
+    def __init__(self, query_class: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Service overloaded ({query_class}), retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.query_class = query_class
+        self.retry_after = retry_after
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter for one query class.
+
+    The limit grows by roughly one slot per limit's worth of fast completions
+    and shrinks multiplicatively when latency exceeds the target or the
+    driver reports a timeout (at most once per target-latency window).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = ADMISSION_INITIAL_LIMIT,
+        min_limit: int = ADMISSION_MIN_LIMIT,
+        max_limit: int = ADMISSION_MAX_LIMIT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        target_latency_ms: float = ADMISSION_TARGET_LATENCY_MS,
+        decrease_factor: float = ADMISSION_DECREASE_FACTOR
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency_ms / 1000.0
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._latency_ewma: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.congestion_signals = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a queued request would be admitted."""
+        latency = self._latency_ewma or self.target_latency
+        return max(1, math.ceil((len(self._waiters) + 1) * latency / self.limit))
+
+    async def acquire(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after())
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AdmissionRejected(self.name, self.retry_after())
+        except BaseException:
+            # Cancelled after a slot was handed over: give it back
+            if waiter.done() and not waiter.cancelled():
+                self._in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self, latency: float, congested: bool = False) -> None:
+        self._in_flight -= 1
+        self.completed += 1
+        self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+        now = time.monotonic()
+        if congested or latency > self.target_latency:
+            self.congestion_signals += 1
+            if now - self._last_decrease >= self.target_latency:
+                self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                self._last_decrease = now
+        else:
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self._in_flight,
+            'queued': len(self._waiters),
+            'max_queue': self.max_queue,
+            'latency_ewma_ms': round(self._latency_ewma * 1000, 3) if self._latency_ewma is not None else None,
+            'target_latency_ms': self.target_latency * 1000,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'completed': self.completed,
+            'congestion_signals': self.congestion_signals
+        }
+
+class AdmissionController:
+    """Registry of per-query-class limiters."""
+
+    def __init__(self, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get_limiter(self, query_class: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(query_class)
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                query_class,
+                initial_limit=_setting(query_class, "INITIAL_LIMIT", ADMISSION_INITIAL_LIMIT),
+                min_limit=_setting(query_class, "MIN_LIMIT", ADMISSION_MIN_LIMIT),
+                max_limit=_setting(query_class, "MAX_LIMIT", ADMISSION_MAX_LIMIT),
+                max_queue=_setting(query_class, "MAX_QUEUE", ADMISSION_MAX_QUEUE),
+                queue_timeout=_setting(query_class, "QUEUE_TIMEOUT", ADMISSION_QUEUE_TIMEOUT),
+                target_latency_ms=_setting(query_class, "TARGET_LATENCY_MS", ADMISSION_TARGET_LATENCY_MS),
+                decrease_factor=_setting(query_class, "DECREASE_FACTOR", ADMISSION_DECREASE_FACTOR)
+            )
+            self._limiters[query_class] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def admit(self, query_class: str):
+        """Hold a concurrency slot for query_class for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+        limiter = self.get_limiter(query_class)
+        await limiter.acquire()
+        start = time.perf_counter()
+        congested = False
+        try:
+            yield
+        except CONGESTION_ERRORS:
+            congested = True
+            raise
+        finally:
+            limiter.release(time.perf_counter() - start, congested)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'classes': {name: limiter.snapshot() for name, limiter in sorted(self._limiters.items())}
+        }
+
+# Create a global instance
+admission_controller = AdmissionController()
@@ -0,0 +1,255 @@
+"""
+Cold-history archive of messages in local segment files.
+
+Each conversation has its own directory of append-only segment files. A
+segment is a sequence of zlib-compressed blocks, each holding a run of
+messages as JSON lines in ascending created_at order. Next to every segment
+is a sparse index file with one line per block:
+
+    <min_created_at_ms> <max_created_at_ms> <offset> <length> <count> [<expires_ms>]
+
+Blocks are always appended in time order, so a read can binary-search the
+index for the newest block before a timestamp and walk backwards, reading
+only the blocks it needs through a memory map of the segment.
+
+Messages archived with a Cassandra TTL keep their expiry time; expired rows
+are skipped on read, and a segment is deleted once all of its blocks have
+expired (expires_ms is 0 for blocks holding any message that never expires).
+"""
+import os
+import json
+import mmap
+import uuid
+import zlib
+import bisect
+import logging
+import time
+import calendar
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_SEGMENT_MAX_BYTES = int(os.getenv("ARCHIVE_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "6"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+def to_millis(value: datetime) -> int:
+    """Convert a datetime (naive UTC, as returned by the driver, or aware) to epoch milliseconds."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(value.timetuple()) * 1000 + value.microsecond // 1000
+
+def from_millis(value: int) -> datetime:
+    """Convert epoch milliseconds to a naive UTC datetime."""
+    return _EPOCH + timedelta(milliseconds=value)
+
+class BlockEntry(NamedTuple):
+    segment: int
+    min_ms: int
+    max_ms: int
+    offset: int
+    length: int
+    count: int
+    expires_ms: int = 0
+
+class MessageArchive:
+    """Reader and writer for per-conversation archive segments."""
+
+    def __init__(self, root: str = ARCHIVE_DIR, segment_max_bytes: int = ARCHIVE_SEGMENT_MAX_BYTES):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self._index_cache: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def _conversation_dir(self, conversation_id: int) -> str:
+        return os.path.join(self.root, str(conversation_id))
+
+    def _segment_path(self, conversation_id: int, segment: int) -> str:
+        return os.path.join(self._conversation_dir(conversation_id), f"{segment:08d}.seg")
+
+    def _index_path(self, conversation_id: int, segment: int) -> str:
+        return os.path.join(self._conversation_dir(conversation_id), f"{segment:08d}.idx")
+
+    def _segments(self, conversation_id: int) -> List[int]:
+        directory = self._conversation_dir(conversation_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".idx"))
+
+    def load_index(self, conversation_id: int) -> List[BlockEntry]:
+        """Load the sparse index of all segments, oldest block first."""
+        segments = self._segments(conversation_id)
+        signature = tuple((s, os.path.getsize(self._index_path(conversation_id, s))) for s in segments)
+        with self._lock:
+            cached = self._index_cache.get(conversation_id)
+            if cached and cached[0] == signature:
+                return cached[1]
+        entries = []
+        for segment in segments:
+            with open(self._index_path(conversation_id, segment)) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) in (5, 6):
+                        entries.append(BlockEntry(segment, *(int(v) for v in fields)))
+        with self._lock:
+            self._index_cache[conversation_id] = (signature, entries)
+        return entries
+
+    def last_archived_at(self, conversation_id: int) -> Optional[datetime]:
+        """Timestamp of the newest archived message, or None if nothing is archived."""
+        entries = self.load_index(conversation_id)
+        return from_millis(entries[-1].max_ms) if entries else None
+
+    def archived_ids_at(self, conversation_id: int, created_ms: int) -> set:
+        """IDs (as strings) of archived messages created in exactly this millisecond."""
+        ids = set()
+        for entry in reversed(self.load_index(conversation_id)):
+            if entry.max_ms < created_ms:
+                break
+            for row in self._read_block(conversation_id, entry):
+                if row['created_at'] == created_ms:
+                    ids.add(str(row['message_id']))
+        return ids
+
+    def purge_expired(self, conversation_id: int, now: Optional[datetime] = None) -> int:
+        """Delete segments whose blocks have all expired. Returns the number of messages removed."""
+        now_ms = to_millis(now or datetime.utcnow())
+        entries = self.load_index(conversation_id)
+        purged = 0
+        for segment in sorted({entry.segment for entry in entries}):
+            blocks = [entry for entry in entries if entry.segment == segment]
+            if all(0 < entry.expires_ms <= now_ms for entry in blocks):
+                # Index first: a crash in between leaves an unreferenced segment, never a dangling entry
+                os.remove(self._index_path(conversation_id, segment))
+                os.remove(self._segment_path(conversation_id, segment))
+                purged += sum(entry.count for entry in blocks)
+        return purged
+
+    def message_count(self, conversation_id: int) -> int:
+        """Number of archived messages, from the block counts in the index."""
+        return sum(entry.count for entry in self.load_index(conversation_id))
+
+    def append_block(self, conversation_id: int, messages: List[Dict[str, Any]]) -> Optional[BlockEntry]:
+        """
+        Append messages as one compressed block.
+
+        Args:
+            conversation_id: ID of the conversation
+            messages: Message rows with plain text content, in ascending created_at order,
+                and an expires_at time for messages written with a TTL
+
+        Returns:
+            The index entry of the written block
+        """
+        if not messages:
+            return None
+        os.makedirs(self._conversation_dir(conversation_id), exist_ok=True)
+        segments = self._segments(conversation_id)
+        segment = segments[-1] if segments else 0
+        segment_path = self._segment_path(conversation_id, segment)
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_max_bytes:
+            segment += 1
+            segment_path = self._segment_path(conversation_id, segment)
+        expiries = [to_millis(m['expires_at']) if m.get('expires_at') else None for m in messages]
+        lines = [
+            json.dumps({
+                'created_at': to_millis(m['created_at']),
+                'message_id': str(m['message_id']),
+                'sender_id': m['sender_id'],
+                'receiver_id': m['receiver_id'],
+                'content': m['content'],
+                'attachment_id': m.get('attachment_id'),
+                'expires_at': expires_ms
+            })
+            for m, expires_ms in zip(messages, expiries)
+        ]
+        payload = zlib.compress("\n".join(lines).encode('utf-8'), ARCHIVE_COMPRESSION_LEVEL)
+        # Write the block before its index line: a crash in between leaves
+        # unreferenced bytes at the end of the segment, never a dangling entry
+        with open(segment_path, 'ab') as f:
+            offset = f.tell()
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        entry = BlockEntry(
+            segment,
+            to_millis(messages[0]['created_at']),
+            to_millis(messages[-1]['created_at']),
+            offset,
+            len(payload),
+            len(messages),
+            0 if None in expiries else max(expiries)
+        )
+        with open(self._index_path(conversation_id, segment), 'a') as f:
+            f.write(f"{entry.min_ms} {entry.max_ms} {entry.offset} {entry.length} {entry.count} {entry.expires_ms}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def _read_block(self, conversation_id: int, entry: BlockEntry) -> List[Dict[str, Any]]:
+        with open(self._segment_path(conversation_id, entry.segment), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                payload = view[entry.offset:entry.offset + entry.length]
+        rows = []
+        for line in zlib.decompress(payload).decode('utf-8').split("\n"):
+            record = json.loads(line)
+            rows.append({
+                'conversation_id': conversation_id,
+                'created_at': record['created_at'],
+                'message_id': uuid.UUID(record['message_id']),
+                'sender_id': record['sender_id'],
+                'receiver_id': record['receiver_id'],
+                'content': record['content'],
+                'attachment_id': record.get('attachment_id'),
+                'expires_at': record.get('expires_at')
+            })
+        return rows
+
+    def read_before(self, conversation_id: int, before: datetime, limit: int, not_before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Read archived messages older than a timestamp, newest first.
+
+        Args:
+            conversation_id: ID of the conversation
+            before: Only return messages created strictly before this time
+            limit: Maximum number of messages to return
+            not_before: Skip messages older than this (retention cutoff)
+
+        Returns:
+            Message rows in descending created_at order
+        """
+        if limit <= 0:
+            return []
+        entries = self.load_index(conversation_id)
+        if not entries:
+            return []
+        before_ms = to_millis(before)
+        floor_ms = to_millis(not_before) if not_before else None
+        now_ms = int(time.time() * 1000)
+        end = bisect.bisect_left([e.min_ms for e in entries], before_ms)
+        results = []
+        for entry in reversed(entries[:end]):
+            if floor_ms is not None and entry.max_ms < floor_ms:
+                break
+            if 0 < entry.expires_ms <= now_ms:
+                continue
+            for row in reversed(self._read_block(conversation_id, entry)):
+                if row['created_at'] >= before_ms:
+                    continue
+                if floor_ms is not None and row['created_at'] < floor_ms:
+                    return results
+                expires_ms = row.pop('expires_at')
+                if expires_ms is not None and expires_ms <= now_ms:
+                    continue
+                row['created_at'] = from_millis(row['created_at'])
+                results.append(row)
+                if len(results) >= limit:
+                    return results
+        return results
+
+# Create a global instance
+message_archive = MessageArchive()
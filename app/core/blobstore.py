@@ -0,0 +1,110 @@
+"""
+Content-addressed store for message attachments on the local filesystem.
+
+A blob's ID is the SHA-256 of its bytes and it lives at
+<BLOB_DIR>/<id[:2]>/<id[2:4]>/<id>. Uploads are streamed chunk by chunk into
+a temporary file while being hashed, then renamed into place; if a blob with
+the same hash already exists the upload is discarded, so identical files
+are stored once. Blobs are immutable, which lets downloads be served
+straight from disk with Range support.
+"""
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(100 * 1024 * 1024)))
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobTooLarge(Exception):
+    pass
+
+class EmptyBlob(Exception):
+    pass
+
+class StoredBlob(NamedTuple):
+    blob_id: str
+    size: int
+    deduplicated: bool
+
+def is_blob_id(value: str) -> bool:
+    return bool(_BLOB_ID.match(value))
+
+class BlobStore:
+    """Streaming writer and path resolver for content-addressed blobs."""
+
+    def __init__(self, root: str = BLOB_DIR, max_bytes: int = BLOB_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, blob_id: str) -> str:
+        if not is_blob_id(blob_id):
+            raise ValueError(f"Invalid blob ID: {blob_id!r}")
+        return os.path.join(self.root, blob_id[:2], blob_id[2:4], blob_id)
+
+    def exists(self, blob_id: str) -> bool:
+        return is_blob_id(blob_id) and os.path.isfile(self.path(blob_id))
+
+    def size(self, blob_id: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(blob_id))
+        except (OSError, ValueError):
+            return None
+
+    def _commit(self, tmp_path: str, blob_id: str) -> bool:
+        """Move a finished upload into place. Returns True if the blob already existed."""
+        target = self.path(blob_id)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+            return True
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Atomic on the same filesystem; a concurrent identical upload just replaces equal bytes
+        os.replace(tmp_path, target)
+        return False
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> StoredBlob:
+        """
+        Write a stream of chunks to the store without holding it in memory.
+
+        Raises:
+            BlobTooLarge: If the stream exceeds max_bytes
+            EmptyBlob: If the stream has no data
+        """
+        loop = asyncio.get_event_loop()
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        f = open(tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise BlobTooLarge(f"Attachment exceeds {self.max_bytes} bytes")
+                digest.update(chunk)
+                await loop.run_in_executor(None, f.write, chunk)
+            await loop.run_in_executor(None, f.close)
+            if size == 0:
+                raise EmptyBlob("Attachment is empty")
+            blob_id = digest.hexdigest()
+            deduplicated = await loop.run_in_executor(None, self._commit, tmp_path, blob_id)
+        except BaseException:
+            f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Stored blob {blob_id} ({size} bytes, deduplicated={deduplicated})")
+        return StoredBlob(blob_id, size, deduplicated)
+
+# Create a global instance
+blob_store = BlobStore()
@@ -0,0 +1,88 @@
+"""
+Transparent compression of message content.
+Content larger than MESSAGE_COMPRESSION_THRESHOLD bytes is stored in the
+content_blob column, compressed with the configured codec, and the codec
+name is recorded in content_encoding. Smaller content stays plain text.
+"""
+import os
+import zlib
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COMPRESSION_CODEC = os.getenv("MESSAGE_COMPRESSION_CODEC", "zlib")  # zlib, zstd or none
+MESSAGE_COMPRESSION_THRESHOLD = int(os.getenv("MESSAGE_COMPRESSION_THRESHOLD", "1024"))
+MESSAGE_COMPRESSION_LEVEL = int(os.getenv("MESSAGE_COMPRESSION_LEVEL", "6"))
+PREVIEW_MAX_LENGTH = int(os.getenv("PREVIEW_MAX_LENGTH", "200"))
+
+PLAIN = None
+ZLIB = 'zlib'
+ZSTD = 'zstd'
+
+def compress(data: bytes, codec: str, level: int = MESSAGE_COMPRESSION_LEVEL) -> bytes:
+    if codec == ZLIB:
+        return zlib.compress(data, level)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd decompression requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+def _active_codec() -> Optional[str]:
+    codec = MESSAGE_COMPRESSION_CODEC.lower()
+    if codec in ('', 'none'):
+        return PLAIN
+    if codec == ZSTD and zstandard is None:
+        logger.warning("zstandard is not installed, falling back to zlib for message content")
+        return ZLIB
+    return codec
+
+def encode_content(content: str, codec: Optional[str] = None, threshold: int = MESSAGE_COMPRESSION_THRESHOLD) -> Tuple[Optional[str], Optional[str], Optional[bytes]]:
+    """
+    Encode message content for storage.
+
+    Args:
+        content: The message text
+        codec: Codec to use, defaults to MESSAGE_COMPRESSION_CODEC
+        threshold: Minimum encoded size in bytes before compressing
+
+    Returns:
+        Tuple of (content, content_encoding, content_blob); exactly one of
+        content and content_blob is set
+    """
+    codec = _active_codec() if codec is None else codec
+    raw = content.encode('utf-8')
+    if codec is PLAIN or len(raw) < threshold:
+        return content, PLAIN, None
+    packed = compress(raw, codec)
+    if len(packed) >= len(raw):
+        return content, PLAIN, None
+    return None, codec, packed
+
+def decode_content(row: Dict[str, Any]) -> Optional[str]:
+    """Return the plain text content of a messages row."""
+    encoding = row.get('content_encoding')
+    if not encoding:
+        return row.get('content')
+    return decompress(row['content_blob'], encoding).decode('utf-8')
+
+def preview(content: str, max_length: int = PREVIEW_MAX_LENGTH) -> str:
+    """Truncate content for the denormalized last_message_content columns."""
+    if content is None or len(content) <= max_length:
+        return content
+    return content[:max_length - 1] + '…'
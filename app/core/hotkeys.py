@@ -0,0 +1,154 @@
+"""
+Hot partition detection.
+
+Every partition key the model layer touches is fed into a space-saving
+top-k summary per (table, read/write) and per time window. Space-saving
+keeps at most HOT_PARTITION_CAPACITY counters: a new key replaces the
+smallest one and inherits its count as an error bound, so any key with more
+than N / capacity hits in a window is guaranteed to be tracked. Keys whose
+guaranteed count (count - error) crosses HOT_PARTITION_ALERT_RATE per second
+are logged once per window, so evicted-and-replaced keys never alert.
+"""
+import os
+import time
+import heapq
+import logging
+from typing import Dict, Any, Hashable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOT_PARTITION_ENABLED = os.getenv("HOT_PARTITION_ENABLED", "true").lower() == "true"
+HOT_PARTITION_WINDOW_SECONDS = float(os.getenv("HOT_PARTITION_WINDOW_SECONDS", "10"))
+HOT_PARTITION_CAPACITY = int(os.getenv("HOT_PARTITION_CAPACITY", "100"))  # Keys tracked per table and operation
+HOT_PARTITION_ALERT_RATE = float(os.getenv("HOT_PARTITION_ALERT_RATE", "100"))  # ops/s per partition, 0 = no alerts
+
+class SpaceSaving:
+    """Space-saving top-k counter with a lazily cleaned min-heap for evictions."""
+
+    def __init__(self, capacity: int = HOT_PARTITION_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self.total = 0
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._tick = 0
+
+    def _push(self, key: Hashable, count: int) -> None:
+        # The tick breaks ties so keys of different types are never compared
+        self._tick += 1
+        heapq.heappush(self._heap, (count, self._tick, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i, k) for i, (k, c) in enumerate(self.counts.items())]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Hashable:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return key
+
+    def offer(self, key: Hashable, n: int = 1) -> int:
+        """Count n hits of key. Returns the key's estimated count."""
+        self.total += n
+        count = self.counts.get(key)
+        if count is None:
+            error = 0
+            if len(self.counts) >= self.capacity:
+                evicted = self._pop_min()
+                error = self.counts.pop(evicted)
+                del self.errors[evicted]
+            count = error
+            self.errors[key] = error
+        count += n
+        self.counts[key] = count
+        self._push(key, count)
+        return count
+
+    def top(self, k: int) -> List[Tuple[Hashable, int, int]]:
+        """The k keys with the highest estimated counts, as (key, count, error)."""
+        return [
+            (key, count, self.errors[key])
+            for key, count in heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        ]
+
+class HotPartitionTracker:
+    """Windowed top-k partitions per table and operation."""
+
+    def __init__(
+        self,
+        window: float = HOT_PARTITION_WINDOW_SECONDS,
+        capacity: int = HOT_PARTITION_CAPACITY,
+        alert_rate: float = HOT_PARTITION_ALERT_RATE,
+        enabled: bool = HOT_PARTITION_ENABLED
+    ):
+        self.window = window
+        self.capacity = capacity
+        self.alert_rate = alert_rate
+        self.enabled = enabled
+        self._alert_count = alert_rate * window if alert_rate > 0 else None
+        self._started = time.monotonic()
+        self._current: Dict[Tuple[str, str], SpaceSaving] = {}
+        self._previous: Dict[Tuple[str, str], SpaceSaving] = {}
+        self._previous_duration = window
+        self._alerted = set()
+
+    def _rotate(self, now: float) -> None:
+        elapsed = now - self._started
+        if elapsed < self.window:
+            return
+        # A gap longer than a window means the last full window saw no traffic
+        self._previous = self._current if elapsed < 2 * self.window else {}
+        self._previous_duration = min(elapsed, self.window)
+        self._current = {}
+        self._alerted = set()
+        self._started = now
+
+    def record(self, table: str, operation: str, key: Hashable) -> None:
+        """Count one access of key's partition in table ('read' or 'write')."""
+        if not self.enabled:
+            return
+        self._rotate(time.monotonic())
+        summary = self._current.get((table, operation))
+        if summary is None:
+            summary = self._current[(table, operation)] = SpaceSaving(self.capacity)
+        count = summary.offer(key) - summary.errors[key]
+        if self._alert_count is not None and count >= self._alert_count and (table, operation, key) not in self._alerted:
+            self._alerted.add((table, operation, key))
+            logger.warning(
+                f"Hot partition: {table} key={key} {operation}s reached {count} "
+                f"in under {self.window:g}s (alert rate {self.alert_rate:g}/s)"
+            )
+
+    def _report(self, windows: Dict[Tuple[str, str], SpaceSaving], duration: float, limit: int) -> Dict[str, Any]:
+        tables: Dict[str, Any] = {}
+        for (table, operation), summary in sorted(windows.items()):
+            tables.setdefault(table, {})[operation] = {
+                'total': summary.total,
+                'top': [
+                    {
+                        'key': key,
+                        'count': count,
+                        'error': error,
+                        'rate': round(count / duration, 2) if duration > 0 else None,
+                        'min_rate': round((count - error) / duration, 2) if duration > 0 else None
+                    }
+                    for key, count, error in summary.top(limit)
+                ]
+            }
+        return tables
+
+    def snapshot(self, limit: int = 10) -> Dict[str, Any]:
+        """Hottest partitions of the window in progress and of the last complete one."""
+        now = time.monotonic()
+        self._rotate(now)
+        elapsed = now - self._started
+        return {
+            'enabled': self.enabled,
+            'window_seconds': self.window,
+            'alert_rate': self.alert_rate,
+            'current': {'elapsed_seconds': round(elapsed, 3), 'tables': self._report(self._current, elapsed, limit)},
+            'previous': {'tables': self._report(self._previous, self._previous_duration, limit)}
+        }
+
+# Create a global instance
+hot_partitions = HotPartitionTracker()
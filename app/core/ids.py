@@ -0,0 +1,193 @@
+"""
+Snowflake-style, time-sortable ID generation for conversations and messages.
+
+A 63-bit ID packs milliseconds since ID_EPOCH_MS (41 bits, ~69 years), the
+worker ID (10 bits) and a per-millisecond sequence (12 bits), so IDs from
+different workers never collide and sort by creation time. The same
+components can be emitted as a version 1 timeuuid for the messages table.
+
+Uniqueness depends on every live process having its own worker ID. A
+process claims its ID with an exclusive lock file under ID_LOCK_DIR, so a
+second process on the same host with the same ID (uvicorn --workers, or a
+script run with the app's environment) fails instead of issuing duplicates.
+Processes on different hosts must still be given distinct IDs.
+"""
+import os
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ID_EPOCH_MS = int(os.getenv("ID_EPOCH_MS", "1704067200000"))  # 2024-01-01T00:00:00Z
+MESSAGE_ID_FORMAT = os.getenv("MESSAGE_ID_FORMAT", "uuid4")  # uuid4 or timeuuid
+ID_LOCK_DIR = os.getenv("ID_LOCK_DIR", tempfile.gettempdir())
+
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_ID_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS
+
+# 100ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+def _worker_id_from_env() -> int:
+    value = os.getenv("ID_WORKER_ID")
+    if value is None:
+        worker_id = os.getpid() & MAX_WORKER_ID
+        logger.warning(f"ID_WORKER_ID is not set, using {worker_id} derived from the process ID")
+        return worker_id
+    worker_id = int(value)
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ValueError(f"ID_WORKER_ID must be between 0 and {MAX_WORKER_ID}")
+    return worker_id
+
+class IdGenerator:
+    """Thread-safe Snowflake ID generator for one worker."""
+
+    def __init__(self, worker_id: int, epoch_ms: int = ID_EPOCH_MS):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self.epoch_ms = epoch_ms
+        self._worker_bits = worker_id << WORKER_ID_SHIFT
+        # Variant bits and clock_seq (the worker ID), then a node with the multicast
+        # bit set since it is not a real MAC address (RFC 4122 section 4.5)
+        self._uuid_low_bits = (0x8000 | (worker_id & 0x3FFF)) << 48 | 0x010000000000 | worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next_components(self):
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now <= self._last_ms:
+                # Same millisecond, or the clock went backwards: keep issuing from the last timestamp
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond
+                    while now <= self._last_ms:
+                        now = time.time_ns() // 1_000_000
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return now, self._sequence
+
+    def next_id(self) -> int:
+        """Return a new 63-bit ID."""
+        now, sequence = self._next_components()
+        return ((now - self.epoch_ms) << TIMESTAMP_SHIFT) | self._worker_bits | sequence
+
+    def next_ids(self, count: int) -> List[int]:
+        """Return count new IDs, taking the lock once (for bulk inserts)."""
+        ids = []
+        with self._lock:
+            now, sequence = self._last_ms, self._sequence
+            while len(ids) < count:
+                current = time.time_ns() // 1_000_000
+                if current > now:
+                    now, sequence = current, -1
+                available = min(MAX_SEQUENCE - sequence, count - len(ids))
+                if available <= 0:
+                    continue  # Sequence exhausted for this millisecond
+                base = ((now - self.epoch_ms) << TIMESTAMP_SHIFT) | self._worker_bits
+                ids.extend(range(base + sequence + 1, base + sequence + 1 + available))
+                sequence += available
+            self._last_ms, self._sequence = now, sequence
+        return ids
+
+    def next_timeuuid(self) -> uuid.UUID:
+        """Return a new version 1 UUID built from the same timestamp, worker and sequence."""
+        now, sequence = self._next_components()
+        # Sequence < 10000, so it fits in the sub-millisecond 100ns ticks
+        timestamp = now * 10000 + sequence + _UUID_EPOCH_OFFSET
+        time_fields = (
+            (timestamp & 0xFFFFFFFF) << 96
+            | ((timestamp >> 32) & 0xFFFF) << 80
+            | (((timestamp >> 48) & 0x0FFF) | 0x1000) << 64
+        )
+        return uuid.UUID(int=time_fields | self._uuid_low_bits)
+
+    def timestamp_ms(self, value: int) -> int:
+        """Unix milliseconds encoded in an ID."""
+        return (value >> TIMESTAMP_SHIFT) + self.epoch_ms
+
+class WorkerIdInUse(RuntimeError):
+    pass
+
+def claim_worker_id(worker_id: int, lock_dir: str = ID_LOCK_DIR):
+    """
+    Take the host-wide lock for worker_id. The returned file object holds the
+    lock until it is closed or the process exits.
+
+    Raises:
+        WorkerIdInUse: If another process on this host holds the same worker ID
+    """
+    if fcntl is None:
+        logger.warning("Cannot lock ID worker IDs on this platform; make sure every process has its own ID_WORKER_ID")
+        return None
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_file = open(os.path.join(lock_dir, f"messenger-id-worker-{worker_id}.lock"), "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise WorkerIdInUse(
+            f"ID worker {worker_id} is already used by another process on this host; "
+            f"give each process its own ID_WORKER_ID (scripts take --worker-id)"
+        )
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+_generator = None
+_generator_claim = None
+_generator_lock = threading.Lock()
+
+def _configure(worker_id: int) -> IdGenerator:
+    global _generator, _generator_claim
+    generator = IdGenerator(worker_id)
+    if _generator_claim is not None:
+        _generator_claim.close()
+        _generator_claim = None
+    _generator_claim = claim_worker_id(worker_id)
+    _generator = generator
+    return generator
+
+def configure_id_generator(worker_id: Optional[int] = None) -> IdGenerator:
+    """
+    Create the process-wide generator for worker_id (default: ID_WORKER_ID)
+    and claim the ID. Call at startup to fail fast on a shared ID.
+    """
+    with _generator_lock:
+        return _configure(_worker_id_from_env() if worker_id is None else worker_id)
+
+def get_id_generator() -> IdGenerator:
+    """Get the process-wide generator, configured from ID_WORKER_ID on first use."""
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _configure(_worker_id_from_env())
+    return _generator
+
+def new_conversation_id() -> int:
+    return get_id_generator().next_id()
+
+def new_message_id() -> uuid.UUID:
+    """New message ID: a timeuuid when MESSAGE_ID_FORMAT=timeuuid, otherwise a random uuid4."""
+    if MESSAGE_ID_FORMAT == "timeuuid":
+        return get_id_generator().next_timeuuid()
+    return uuid.uuid4()
@@ -0,0 +1,118 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+While a call for a given key is in flight, further callers with the same key
+wait on the same task instead of issuing their own query. The key is removed
+as soon as the task finishes, so results are never cached beyond the flight
+and a failed query is retried by the next caller. A caller that is cancelled
+only stops waiting; the shared task is cancelled once no callers are left.
+"""
+import os
+import asyncio
+import inspect
+import logging
+import functools
+from typing import Dict, Any, Awaitable, Callable, Hashable
+
+from app.core.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """In-flight calls of one function, keyed by their arguments."""
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _done(self, key: Hashable, call: _Call, task: asyncio.Task) -> None:
+        self._forget(key, call)
+        # Retrieving the exception also keeps asyncio from logging it as never retrieved
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn, or wait for the in-flight run with the same key. Callers share the result object."""
+        if not self.enabled:
+            return await fn()
+        self.calls += 1
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            self.executions += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(functools.partial(self._done, key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            if leader:
+                return await asyncio.shield(call.task)
+            with trace_span('coalesced_wait', flight=self.name):
+                return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                self.cancelled += 1
+            raise
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is waiting any more; new callers must start a fresh flight
+                self._forget(key, call)
+                call.task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalescing_ratio': round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'in_flight': len(self._calls)
+        }
+
+_flights: Dict[str, SingleFlight] = {}
+
+def single_flight(name: str):
+    """
+    Decorator coalescing concurrent calls of an async function with equal arguments.
+    Arguments are bound to the signature, so positional and keyword calls share a key.
+    """
+    def decorator(fn):
+        flight = _flights.setdefault(name, SingleFlight(name))
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            return await flight.do(key, lambda: fn(*args, **kwargs))
+        wrapper.flight = flight
+        return wrapper
+    return decorator
+
+def snapshot() -> Dict[str, Any]:
+    """Coalescing metrics of every single-flight function."""
+    return {name: flight.snapshot() for name, flight in _flights.items()}
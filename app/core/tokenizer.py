@@ -0,0 +1,68 @@
+"""
+Tokenizers used to build and query the message search index.
+The active tokenizer can be swapped at runtime or through the
+SEARCH_TOKENIZER environment variable (dotted path to a Tokenizer class).
+"""
+import os
+import re
+import importlib
+from typing import List, Optional
+
+SEARCH_TOKENIZER = os.getenv("SEARCH_TOKENIZER", "app.core.tokenizer.SimpleTokenizer")
+SEARCH_MIN_TOKEN_LENGTH = int(os.getenv("SEARCH_MIN_TOKEN_LENGTH", "2"))
+SEARCH_MAX_TOKEN_LENGTH = int(os.getenv("SEARCH_MAX_TOKEN_LENGTH", "64"))
+
+class Tokenizer:
+    """Base class for tokenizers. Subclasses implement tokenize()."""
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Split text into index tokens.
+
+        Args:
+            text: The text to tokenize
+
+        Returns:
+            Unique tokens in order of first appearance
+        """
+        raise NotImplementedError
+
+class SimpleTokenizer(Tokenizer):
+    """Lowercases text and splits it on non-word characters."""
+
+    _word_re = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, min_length: int = SEARCH_MIN_TOKEN_LENGTH, max_length: int = SEARCH_MAX_TOKEN_LENGTH):
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def tokenize(self, text: str) -> List[str]:
+        if not text:
+            return []
+        seen = set()
+        tokens = []
+        for word in self._word_re.findall(text.lower()):
+            if len(word) < self.min_length or len(word) > self.max_length or word in seen:
+                continue
+            seen.add(word)
+            tokens.append(word)
+        return tokens
+
+_tokenizer: Optional[Tokenizer] = None
+
+def _load_tokenizer(path: str) -> Tokenizer:
+    module_name, _, class_name = path.rpartition(".")
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)()
+
+def get_tokenizer() -> Tokenizer:
+    """Get the active tokenizer, loading the configured one on first use."""
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = _load_tokenizer(SEARCH_TOKENIZER)
+    return _tokenizer
+
+def set_tokenizer(tokenizer: Tokenizer) -> None:
+    """Replace the active tokenizer."""
+    global _tokenizer
+    _tokenizer = tokenizer
@@ -0,0 +1,153 @@
+"""
+Opt-in per-request tracing.
+
+A request is traced when it carries the TRACE_HEADER header (value "1", or
+"driver" to also fetch Cassandra query traces) or is picked by
+TRACE_SAMPLE_RATE. Spans recorded during the request (Cassandra calls,
+executor and admission waits, controller phases) are returned as
+Server-Timing response headers and appended as JSON lines to a rotating
+trace log.
+"""
+import os
+import json
+import time
+import random
+import logging
+import logging.handlers
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Trace")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_DRIVER_QUERIES = os.getenv("TRACE_DRIVER_QUERIES", "false").lower() == "true"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "logs/trace.log")
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+
+class RequestTrace:
+    """Spans recorded for a single request. Safe to append to from executor threads."""
+
+    def __init__(self, driver_trace: bool = False):
+        self.driver_trace = driver_trace
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add_span(self, name: str, start: float, duration: float, **meta) -> Dict[str, Any]:
+        span = {
+            'name': name,
+            'start_ms': round((start - self.started) * 1000, 3),
+            'dur_ms': round(duration * 1000, 3),
+            **meta
+        }
+        self.spans.append(span)
+        return span
+
+    def server_timing(self, total: float) -> str:
+        """Render spans aggregated by name as a Server-Timing header value."""
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span['name'], [0.0, 0])
+            entry[0] += span['dur_ms']
+            entry[1] += 1
+        parts = [
+            f'{name};dur={dur:.3f};desc="{count}x"' if count > 1 else f'{name};dur={dur:.3f}'
+            for name, (dur, count) in totals.items()
+        ]
+        parts.append(f'total;dur={total * 1000:.3f}')
+        return ", ".join(parts)
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+@contextmanager
+def trace_span(name: str, **meta):
+    """Record a span on the current request trace, if any. Yields a dict for extra metadata."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield meta
+        return
+    start = time.perf_counter()
+    try:
+        yield meta
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start, **meta)
+
+_trace_log: Optional[logging.Logger] = None
+
+def _get_trace_log() -> logging.Logger:
+    global _trace_log
+    if _trace_log is None:
+        os.makedirs(os.path.dirname(TRACE_LOG_PATH) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_log = logging.getLogger("app.trace")
+        trace_log.setLevel(logging.INFO)
+        trace_log.propagate = False
+        trace_log.addHandler(handler)
+        _trace_log = trace_log
+    return _trace_log
+
+class TracingMiddleware:
+    """ASGI middleware that enables tracing per request and emits the results."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested(self, scope) -> Optional[str]:
+        header = TRACE_HEADER.lower().encode("latin-1")
+        for key, value in scope.get("headers", []):
+            if key == header:
+                return value.decode("latin-1").lower()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if requested in (None, "0", "false") and not (TRACE_SAMPLE_RATE and random.random() < TRACE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(driver_trace=TRACE_DRIVER_QUERIES or requested == "driver")
+        token = _current_trace.set(trace)
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Time between the last recorded span and the response start is
+                # response validation and serialization
+                now = time.perf_counter()
+                if trace.spans:
+                    last_end = max(s['start_ms'] + s['dur_ms'] for s in trace.spans) / 1000 + trace.started
+                    trace.add_span('serialize', last_end, max(0.0, now - last_end))
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing(now - trace.started).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            total = time.perf_counter() - trace.started
+            try:
+                _get_trace_log().info(json.dumps({
+                    'ts': time.time(),
+                    'method': scope.get("method"),
+                    'path': scope.get("path"),
+                    'status': status_code,
+                    'total_ms': round(total * 1000, 3),
+                    'spans': trace.spans
+                }, default=str))
+            except Exception as e:
+                logger.warning(f"Failed to write request trace: {e}")
@@ -0,0 +1,131 @@
+"""
+In-memory coalescing of monotonic watermarks (e.g. read receipts).
+Updates only keep the highest mark per key and are written out in periodic
+batches, so a burst of updates for one key costs a single write.
+"""
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_FLUSH_INTERVAL = float(os.getenv("WATERMARK_FLUSH_INTERVAL", "2.0"))  # seconds
+WATERMARK_MAX_PENDING = int(os.getenv("WATERMARK_MAX_PENDING", "10000"))  # flush early above this
+WATERMARK_FLUSHED_CACHE = int(os.getenv("WATERMARK_FLUSHED_CACHE", "100000"))
+
+class WatermarkBuffer:
+    """
+    Buffer of pending watermarks keyed by (group, item) tuples, e.g.
+    (conversation_id, user_id), so pending marks of one group can be read back.
+
+    A mark is a tuple whose first element orders it (e.g. (created_at, message_id));
+    updates that do not move a key's mark forward are dropped.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[Dict[Hashable, Tuple]], Awaitable[None]],
+        interval: float = WATERMARK_FLUSH_INTERVAL,
+        max_pending: int = WATERMARK_MAX_PENDING,
+        flushed_cache: int = WATERMARK_FLUSHED_CACHE
+    ):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self.flushed_cache = flushed_cache
+        self._pending: Dict[Hashable, Tuple] = {}
+        self._groups: Dict[Hashable, set] = {}
+        self._flushed: Dict[Hashable, Tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def update(self, key: Hashable, mark: Tuple) -> bool:
+        """Record a watermark. Returns False if it does not advance the current one."""
+        self.updates += 1
+        current = self._pending.get(key)
+        if current is not None:
+            self.coalesced += 1
+            if mark[0] <= current[0]:
+                return False
+        else:
+            flushed = self._flushed.get(key)
+            if flushed is not None and mark[0] <= flushed[0]:
+                self.coalesced += 1
+                return False
+        self._pending[key] = mark
+        self._groups.setdefault(key[0], set()).add(key)
+        if len(self._pending) >= self.max_pending and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.get_event_loop().create_task(self.flush())
+        return True
+
+    def current(self, key: Hashable) -> Optional[Tuple]:
+        """Latest known mark for key: pending, or else the last one flushed by this process."""
+        return self._pending.get(key) or self._flushed.get(key)
+
+    def pending_in(self, group: Hashable) -> Dict[Hashable, Tuple]:
+        """Pending marks whose key starts with group."""
+        return {key: self._pending[key] for key in self._groups.get(group, ())}
+
+    async def flush(self) -> None:
+        """Write out all pending watermarks as one batch."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._groups = {}
+        try:
+            await self.flush_fn(batch)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to flush {len(batch)} watermarks, will retry: {e}")
+            for key, mark in batch.items():
+                current = self._pending.get(key)
+                if current is None or mark[0] > current[0]:
+                    self._pending[key] = mark
+                    self._groups.setdefault(key[0], set()).add(key)
+            return
+        self.flushes += 1
+        self.rows_written += len(batch)
+        if len(self._flushed) + len(batch) > self.flushed_cache:
+            self._flushed.clear()
+        for key, mark in batch.items():
+            self._flushed[key] = mark
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Watermark flush loop error: {e}")
+
+    def start(self) -> None:
+        """Start the periodic flush task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write out what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self._pending),
+            'updates': self.updates,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'failures': self.failures
+        }
@@ -3,6 +3,7 @@ Cassandra client for the Messenger application.
 This provides a connection to the Cassandra database.
 """
 import os
+import time
 import uuid
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -12,8 +13,13 @@ from cassandra.cluster import Cluster, Session
 from cassandra.auth import PlainTextAuthProvider
 from cassandra.query import SimpleStatement, dict_factory
 
+from app.core.tracing import current_trace
+
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for a driver query trace when tracing with X-Trace: driver
+TRACE_FETCH_TIMEOUT = float(os.getenv("TRACE_FETCH_TIMEOUT", "2.0"))
+
 class CassandraClient:
     """Singleton Cassandra client for the application."""
     
@@ -33,6 +39,8 @@ class CassandraClient:
         self.host = os.getenv("CASSANDRA_HOST", "localhost")
         self.port = int(os.getenv("CASSANDRA_PORT", "9042"))
         self.keyspace = os.getenv("CASSANDRA_KEYSPACE", "messenger")
+        # Native protocol compression: lz4, snappy, or none
+        self.compression = os.getenv("CASSANDRA_COMPRESSION", "lz4").lower()
         
         self.cluster = None
         self.session = None
@@ -43,7 +51,7 @@ class CassandraClient:
     def connect(self) -> None:
         """Connect to the Cassandra cluster."""
         try:
-            self.cluster = Cluster([self.host])
+            self.cluster = Cluster([self.host], port=self.port, compression=self._compression_option())
             self.session = self.cluster.connect(self.keyspace)
             self.session.row_factory = dict_factory
             logger.info(f"Connected to Cassandra at {self.host}:{self.port}, keyspace: {self.keyspace}")
@@ -51,6 +59,12 @@ class CassandraClient:
             logger.error(f"Failed to connect to Cassandra: {str(e)}")
             raise
     
+    def _compression_option(self):
+        """Map CASSANDRA_COMPRESSION to the driver's compression argument."""
+        if self.compression in ('', 'none', 'false'):
+            return False
+        return self.compression
+    
     def close(self) -> None:
         """Close the Cassandra connection."""
         if self.cluster:
@@ -71,14 +85,34 @@ class CassandraClient:
         if not self.session:
             self.connect()
         
+        trace = current_trace()
         try:
             statement = SimpleStatement(query)
-            result = self.session.execute(statement, params or {})
-            return list(result)
+            if trace is None:
+                result = self.session.execute(statement, params or {})
+                return list(result)
+            start = time.perf_counter()
+            result = self.session.execute(statement, params or {}, trace=trace.driver_trace)
+            rows = list(result)
+            span = trace.add_span('cassandra', start, time.perf_counter() - start, query=" ".join(query.split())[:120], rows=len(rows))
+            if trace.driver_trace:
+                self._attach_query_trace(result, span)
+            return rows
         except Exception as e:
             logger.error(f"Query execution failed: {str(e)}")
             raise
     
+    def _attach_query_trace(self, result, span: dict) -> None:
+        """Add the server-side query trace of a result to a span."""
+        try:
+            query_trace = result.get_query_trace(max_wait_sec=TRACE_FETCH_TIMEOUT)
+            span['coordinator'] = str(query_trace.coordinator)
+            span['server_duration_us'] = query_trace.duration.microseconds + query_trace.duration.seconds * 1000000 if query_trace.duration else None
+            span['trace_id'] = str(query_trace.trace_id)
+            span['events'] = [f"{event.source}: {event.description}" for event in query_trace.events]
+        except Exception as e:
+            logger.warning(f"Could not fetch query trace: {str(e)}")
+    
     def execute_async(self, query: str, params: dict = None):
         """
         Execute a CQL query asynchronously.
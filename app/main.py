@@ -4,10 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 import sys
 import os
 
-from app.api.routes import message_router, conversation_router
+from app.api.routes import message_router, conversation_router, admin_router, user_router, attachment_router
 from app.controllers.message_controller import MessageController
 from app.controllers.conversation_controller import ConversationController
 from app.db.cassandra_client import cassandra_client
+from app.core.tracing import TracingMiddleware
+from app.core.ids import configure_id_generator
+from app.models.cassandra_models import read_receipt_buffer, SearchIndexModel
 
 # Configure logging
 logging.basicConfig(
@@ -29,8 +32,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
+# Opt-in per-request tracing (X-Trace header or TRACE_SAMPLE_RATE)
+app.add_middleware(TracingMiddleware)
+
 # Dependency injection
 def get_message_controller():
     """Dependency for message controller."""
@@ -47,6 +54,9 @@ def get_conversation_controller():
 # Include routers
 app.include_router(message_router)
 app.include_router(conversation_router)
+app.include_router(user_router)
+app.include_router(attachment_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
@@ -56,10 +66,17 @@ async def root():
 async def startup_event():
     """Initialize services on startup."""
     logger.info("Initializing application...")
+    try:
+        # Claim this process's ID worker; fails if another local process shares ID_WORKER_ID
+        configure_id_generator()
+    except Exception as e:
+        logger.error(f"Failed to claim ID worker: {str(e)}")
+        sys.exit(1)
     try:
         # Ensure Cassandra connection is established
         cassandra_client.get_session()
         logger.info("Cassandra connection established")
+        read_receipt_buffer.start()
     except Exception as e:
         logger.error(f"Failed to connect to Cassandra: {str(e)}")
         sys.exit(1)
@@ -68,6 +85,9 @@ async def startup_event():
 async def shutdown_event():
     """Clean up resources on shutdown."""
     logger.info("Shutting down application...")
+    # Write out buffered read receipts before the connection goes away
+    await read_receipt_buffer.stop()
+    await SearchIndexModel.drain()
     cassandra_client.close()
 
 if __name__ == "__main__":
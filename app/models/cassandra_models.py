@@ -2,12 +2,114 @@
 Sample models for interacting with Cassandra tables.
 Students should implement these models based on their database schema design.
 """
-import uuid
-from datetime import datetime
+import os
+import re
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import asyncio
+import logging
+import functools
+import contextvars
 
 from app.db.cassandra_client import cassandra_client
+from app.core.tokenizer import get_tokenizer
+from app.core.admission import admission_controller
+from app.core.compression import encode_content, decode_content, preview
+from app.core.archive import message_archive, to_millis, from_millis
+from app.core.ids import new_conversation_id, new_message_id
+from app.core.tracing import current_trace
+from app.core.watermarks import WatermarkBuffer
+from app.core.hotkeys import hot_partitions
+from app.core.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Search index settings
+SEARCH_MAX_TOKENS_PER_MESSAGE = int(os.getenv("SEARCH_MAX_TOKENS_PER_MESSAGE", "64"))
+SEARCH_MAX_POSTINGS = int(os.getenv("SEARCH_MAX_POSTINGS", "1000"))
+SEARCH_INDEX_MAX_PENDING = int(os.getenv("SEARCH_INDEX_MAX_PENDING", "1000"))  # Background indexing tasks, beyond this messages are skipped
+SEARCH_INDEX_MAX_ATTEMPTS = int(os.getenv("SEARCH_INDEX_MAX_ATTEMPTS", "4"))
+SEARCH_INDEX_RETRY_DELAY = float(os.getenv("SEARCH_INDEX_RETRY_DELAY", "0.5"))  # seconds, doubled per attempt
+SEARCH_INDEX_FAILED_CONVERSATIONS = int(os.getenv("SEARCH_INDEX_FAILED_CONVERSATIONS", "1000"))  # IDs kept for repair
+
+# Groups with more members than this use fan-out-on-read instead of fan-out-on-write
+GROUP_FANOUT_WRITE_MAX_MEMBERS = int(os.getenv("GROUP_FANOUT_WRITE_MAX_MEMBERS", "100"))
+
+# Retention settings (0 = keep forever)
+MESSAGE_DEFAULT_RETENTION_SECONDS = int(os.getenv("MESSAGE_DEFAULT_RETENTION_SECONDS", "0"))
+RETENTION_CACHE_SECONDS = float(os.getenv("RETENTION_CACHE_SECONDS", "60"))
+RETENTION_CACHE_MAX_ENTRIES = int(os.getenv("RETENTION_CACHE_MAX_ENTRIES", "10000"))
+
+# Read receipt writes in flight per flush chunk
+READ_RECEIPT_FLUSH_CONCURRENCY = int(os.getenv("READ_RECEIPT_FLUSH_CONCURRENCY", "32"))
+
+# Group member rows written in flight per chunk, kept below the conversation_write
+# admission queue so a large group is not rejected by its own writes
+FAN_OUT_WRITE_CONCURRENCY = int(os.getenv("FAN_OUT_WRITE_CONCURRENCY", "32"))
+
+# Counter updates per counter batch (group creation bumps one counter per member)
+COUNTER_BATCH_SIZE = int(os.getenv("COUNTER_BATCH_SIZE", "100"))
+
+# Partition key column of each table whose accesses feed hot partition detection
+HOT_PARTITION_KEYS = {
+    'messages': 'conversation_id',
+    'conversations': 'conversation_id',
+    'user_conversations': 'user_id'
+}
+_QUERY_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+(\w+)', re.IGNORECASE)
+_query_tables: Dict[str, List[str]] = {}
+
+def _record_partitions(query_class: str, query: str, params: Optional[dict]):
+    """Feed the partition keys a query touches into the hot partition tracker."""
+    tables = _query_tables.get(query)
+    if tables is None:
+        if len(_query_tables) > 1024:
+            _query_tables.clear()
+        tables = _query_tables[query] = [t for t in _QUERY_TABLE.findall(query) if t in HOT_PARTITION_KEYS]
+    if not tables or not params:
+        return
+    operation = 'write' if query_class.endswith('_write') else 'read'
+    for table in tables:
+        key = params.get(HOT_PARTITION_KEYS[table])
+        if key is not None:
+            hot_partitions.record(table, operation, key)
+
+def _run_traced(trace, submitted: float, query: str, params: dict):
+    """Executor-side half of _execute: records how long the call waited for a thread."""
+    trace.add_span('executor_wait', submitted, time.perf_counter() - submitted)
+    return cassandra_client.execute(query, params)
+
+async def _execute(query_class: str, query: str, params: dict = None):
+    """Run a query in the executor once admission control grants a slot for its class."""
+    _record_partitions(query_class, query, params)
+    trace = current_trace()
+    loop = asyncio.get_event_loop()
+    waiting = time.perf_counter()
+    async with admission_controller.admit(query_class):
+        if trace is None:
+            return await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        trace.add_span('admission_wait', waiting, time.perf_counter() - waiting, query_class=query_class)
+        # run_in_executor does not carry context variables over, so run inside a copy
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, _run_traced, trace, time.perf_counter(), query, params)
+
+async def _execute_chunked(query_class: str, statements: List[tuple], chunk_size: int = None):
+    """Run (query, params) pairs concurrently, chunk_size at a time."""
+    chunk_size = chunk_size or FAN_OUT_WRITE_CONCURRENCY
+    for start in range(0, len(statements), chunk_size):
+        await asyncio.gather(*[
+            _execute(query_class, query, params)
+            for query, params in statements[start:start + chunk_size]
+        ])
+
+def _decode_messages(rows):
+    """Replace stored (possibly compressed) content with plain text."""
+    for row in rows:
+        row['content'] = decode_content(row)
+        row.pop('content_blob', None)
+    return rows
+
 
 class MessageModel:
     """
@@ -21,12 +123,15 @@ class MessageModel:
     """
     
     @staticmethod
-    async def create_message(conversation_id: int, sender_id: int, receiver_id: int, content: str, created_at: datetime, message_id=None):
+    async def create_message(conversation_id: int, sender_id: int, receiver_id: int, content: str, created_at: datetime, message_id=None, attachment_id: Optional[str] = None):
         if message_id is None:
-            message_id = uuid.uuid4()
+            message_id = new_message_id()
+        stored_content, content_encoding, content_blob = encode_content(content)
+        ttl = await ConversationModel.get_retention(conversation_id)
         query = '''
-            INSERT INTO messages (conversation_id, created_at, message_id, sender_id, receiver_id, content)
-            VALUES (%(conversation_id)s, %(created_at)s, %(message_id)s, %(sender_id)s, %(receiver_id)s, %(content)s)
+            INSERT INTO messages (conversation_id, created_at, message_id, sender_id, receiver_id, content, content_encoding, content_blob, attachment_id)
+            VALUES (%(conversation_id)s, %(created_at)s, %(message_id)s, %(sender_id)s, %(receiver_id)s, %(content)s, %(content_encoding)s, %(content_blob)s, %(attachment_id)s)
+            USING TTL %(ttl)s
         '''
         params = {
             'conversation_id': conversation_id,
@@ -34,22 +139,49 @@ class MessageModel:
             'message_id': message_id,
             'sender_id': sender_id,
             'receiver_id': receiver_id,
-            'content': content
+            'content': stored_content,
+            'content_encoding': content_encoding,
+            'content_blob': content_blob,
+            'attachment_id': attachment_id,
+            'ttl': ttl
         }
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        await _execute('message_write', query, params)
+        SearchIndexModel.schedule_index(conversation_id, sender_id, receiver_id, content, created_at, message_id, ttl)
         return message_id
+
+    @staticmethod
+    async def get_message(conversation_id: int, created_at: datetime, message_id):
+        query = '''
+            SELECT * FROM messages WHERE conversation_id = %(conversation_id)s AND created_at = %(created_at)s AND message_id = %(message_id)s
+        '''
+        params = {'conversation_id': conversation_id, 'created_at': created_at, 'message_id': message_id}
+        rows = _decode_messages(await _execute('message_read', query, params))
+        return rows[0] if rows else None
     
     @staticmethod
+    @single_flight('get_conversation_messages')
     async def get_conversation_messages(conversation_id: int, page: int = 1, limit: int = 20):
         offset = (page - 1) * limit
         query = '''
             SELECT * FROM messages WHERE conversation_id = %(conversation_id)s ORDER BY created_at DESC, message_id ASC LIMIT %(limit)s
         '''
         params = {'conversation_id': conversation_id, 'limit': offset + limit}
-        loop = asyncio.get_event_loop()
-        rows = await loop.run_in_executor(None, cassandra_client.execute, query, params)
-        return rows[offset:offset+limit]
+        rows = await _execute('message_read', query, params)
+        return _decode_messages(rows[offset:offset+limit])
+    
+    @staticmethod
+    async def get_messages_up_to(conversation_id: int, up_to: Optional[datetime], limit: int):
+        """Newest messages with created_at <= up_to (or the newest overall when up_to is None)."""
+        if up_to is None:
+            query = '''
+                SELECT * FROM messages WHERE conversation_id = %(conversation_id)s LIMIT %(limit)s
+            '''
+        else:
+            query = '''
+                SELECT * FROM messages WHERE conversation_id = %(conversation_id)s AND created_at <= %(up_to)s LIMIT %(limit)s
+            '''
+        params = {'conversation_id': conversation_id, 'up_to': up_to, 'limit': limit}
+        return _decode_messages(await _execute('message_read', query, params))
     
     @staticmethod
     async def get_messages_before_timestamp(conversation_id: int, before_timestamp: datetime, page: int = 1, limit: int = 20):
@@ -58,10 +190,176 @@ class MessageModel:
             SELECT * FROM messages WHERE conversation_id = %(conversation_id)s AND created_at < %(before_timestamp)s ORDER BY created_at DESC, message_id ASC LIMIT %(limit)s
         '''
         params = {'conversation_id': conversation_id, 'before_timestamp': before_timestamp, 'limit': offset + limit}
-        loop = asyncio.get_event_loop()
-        rows = await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        rows = _decode_messages(await _execute('message_read', query, params))
+        if len(rows) < offset + limit:
+            # The query reaches past the hot window: continue into the archive
+            rows += await MessageModel.get_archived_messages_before(
+                conversation_id, before_timestamp, offset + limit - len(rows), {row['message_id'] for row in rows}
+            )
         return rows[offset:offset+limit]
 
+    @staticmethod
+    async def get_archived_messages_before(conversation_id: int, before_timestamp: datetime, limit: int, exclude_ids=()):
+        retention = await ConversationModel.get_retention(conversation_id)
+        not_before = datetime.utcnow() - timedelta(seconds=retention) if retention else None
+        loop = asyncio.get_event_loop()
+        rows = await loop.run_in_executor(
+            None, message_archive.read_before, conversation_id, before_timestamp, limit + len(exclude_ids), not_before
+        )
+        return [row for row in rows if row['message_id'] not in exclude_ids][:limit]
+
+
+class SearchIndexModel:
+    """
+    Inverted index over message content stored in the message_search_index table.
+    Each token maps to the keys of the messages containing it, both per
+    conversation (scope 'conversation') and per participant (scope 'user').
+    """
+
+    CONVERSATION_SCOPE = 'conversation'
+    USER_SCOPE = 'user'
+
+    # Background indexing tasks, referenced so they are not garbage collected mid-flight
+    _pending_index_tasks = set()
+    # Conversations with messages that could not be indexed, oldest first
+    _failed_conversations: Dict[int, None] = {}
+    indexed = 0
+    index_retries = 0
+    index_failures = 0
+    index_dropped = 0
+
+    @staticmethod
+    async def index_message(conversation_id: int, sender_id: int, receiver_id: int, content: str, created_at: datetime, message_id, ttl: int = 0):
+        """Write a message's postings as one UNLOGGED batch per scope. Returns the number of tokens indexed."""
+        tokens = get_tokenizer().tokenize(content)[:SEARCH_MAX_TOKENS_PER_MESSAGE]
+        if not tokens:
+            return 0
+        scopes = [(SearchIndexModel.CONVERSATION_SCOPE, conversation_id)]
+        scopes += [(SearchIndexModel.USER_SCOPE, uid) for uid in {sender_id, receiver_id} if uid is not None]
+        statements = [
+            f'''INSERT INTO message_search_index (scope, scope_id, token, created_at, conversation_id, message_id)
+            VALUES (%(scope)s, %(scope_id)s, %(token_{i})s, %(created_at)s, %(conversation_id)s, %(message_id)s)
+            USING TTL %(ttl)s'''
+            for i in range(len(tokens))
+        ]
+        query = "BEGIN UNLOGGED BATCH\n" + ";\n".join(statements) + ";\nAPPLY BATCH"
+        params = {f'token_{i}': token for i, token in enumerate(tokens)}
+        params.update({
+            'created_at': created_at,
+            'conversation_id': conversation_id,
+            'message_id': message_id,
+            'ttl': ttl
+        })
+        await asyncio.gather(*[
+            _execute('search_write', query, {**params, 'scope': scope, 'scope_id': scope_id})
+            for scope, scope_id in scopes
+        ])
+        return len(tokens)
+
+    @staticmethod
+    async def _index_with_retry(conversation_id: int, *args):
+        """index_message with exponential backoff, e.g. while search_write admission is saturated."""
+        for attempt in range(1, SEARCH_INDEX_MAX_ATTEMPTS + 1):
+            try:
+                return await SearchIndexModel.index_message(conversation_id, *args)
+            except Exception as e:
+                if attempt == SEARCH_INDEX_MAX_ATTEMPTS:
+                    raise
+                SearchIndexModel.index_retries += 1
+                logger.warning(f"Indexing a message of conversation {conversation_id} failed (attempt {attempt}), retrying: {e}")
+                await asyncio.sleep(SEARCH_INDEX_RETRY_DELAY * 2 ** (attempt - 1))
+
+    @staticmethod
+    def _record_failure(conversation_id: int):
+        failed = SearchIndexModel._failed_conversations
+        failed.pop(conversation_id, None)
+        failed[conversation_id] = None
+        if len(failed) > SEARCH_INDEX_FAILED_CONVERSATIONS:
+            del failed[next(iter(failed))]
+
+    @staticmethod
+    def schedule_index(conversation_id: int, sender_id: int, receiver_id: int, content: str, created_at: datetime, message_id, ttl: int = 0):
+        """
+        Index a stored message in the background, retrying failed writes. Indexing
+        never fails the send: when SEARCH_INDEX_MAX_PENDING tasks are already pending,
+        or every attempt fails, the conversation is recorded in snapshot() so that
+        scripts/backfill_search_index.py --conversation-id can restore its postings.
+        """
+        if len(SearchIndexModel._pending_index_tasks) >= SEARCH_INDEX_MAX_PENDING:
+            SearchIndexModel.index_dropped += 1
+            SearchIndexModel._record_failure(conversation_id)
+            logger.error(f"Search indexing backlog full, skipped a message of conversation {conversation_id}")
+            return None
+        task = asyncio.ensure_future(SearchIndexModel._index_with_retry(
+            conversation_id, sender_id, receiver_id, content, created_at, message_id, ttl
+        ))
+        SearchIndexModel._pending_index_tasks.add(task)
+        task.add_done_callback(functools.partial(SearchIndexModel._index_done, conversation_id))
+        return task
+
+    @staticmethod
+    def _index_done(conversation_id: int, task):
+        SearchIndexModel._pending_index_tasks.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            SearchIndexModel.index_failures += 1
+            SearchIndexModel._record_failure(conversation_id)
+            logger.error(f"Failed to index a message of conversation {conversation_id}: {'cancelled' if task.cancelled() else task.exception()}")
+        else:
+            SearchIndexModel.indexed += 1
+
+    @staticmethod
+    def snapshot() -> Dict[str, Any]:
+        return {
+            'pending': len(SearchIndexModel._pending_index_tasks),
+            'max_pending': SEARCH_INDEX_MAX_PENDING,
+            'indexed': SearchIndexModel.indexed,
+            'retries': SearchIndexModel.index_retries,
+            'failures': SearchIndexModel.index_failures,
+            'dropped': SearchIndexModel.index_dropped,
+            'failed_conversations': list(SearchIndexModel._failed_conversations)
+        }
+
+    @staticmethod
+    async def drain():
+        """Wait for background indexing to finish (on shutdown)."""
+        if SearchIndexModel._pending_index_tasks:
+            await asyncio.gather(*SearchIndexModel._pending_index_tasks, return_exceptions=True)
+
+    @staticmethod
+    async def get_postings(scope: str, scope_id: int, token: str, limit: int):
+        query = '''
+            SELECT created_at, conversation_id, message_id FROM message_search_index
+            WHERE scope = %(scope)s AND scope_id = %(scope_id)s AND token = %(token)s LIMIT %(limit)s
+        '''
+        params = {'scope': scope, 'scope_id': scope_id, 'token': token, 'limit': limit}
+        return await _execute('search_read', query, params)
+
+    @staticmethod
+    async def search(scope: str, scope_id: int, query_text: str, page: int = 1, limit: int = 20):
+        """Return the message keys (newest first) whose content contains every query token."""
+        tokens = get_tokenizer().tokenize(query_text)
+        if not tokens:
+            return []
+        offset = (page - 1) * limit
+        # A single token can be paged directly; intersections need a bounded candidate window
+        fetch_limit = offset + limit if len(tokens) == 1 else max(SEARCH_MAX_POSTINGS, offset + limit)
+        postings = await asyncio.gather(*[
+            SearchIndexModel.get_postings(scope, scope_id, token, fetch_limit) for token in tokens
+        ])
+        key = lambda row: (row['created_at'], row['conversation_id'], row['message_id'])
+        others = [set(key(row) for row in rows) for rows in postings[1:]]
+        matches = [row for row in postings[0] if all(key(row) in keys for keys in others)]
+        return matches[offset:offset+limit]
+
+    @staticmethod
+    async def search_messages(scope: str, scope_id: int, query_text: str, page: int = 1, limit: int = 20):
+        """Search the index and load the matching message rows."""
+        keys = await SearchIndexModel.search(scope, scope_id, query_text, page, limit)
+        rows = await asyncio.gather(*[
+            MessageModel.get_message(k['conversation_id'], k['created_at'], k['message_id']) for k in keys
+        ])
+        return [row for row in rows if row]
+
 
 class ConversationModel:
     """
@@ -73,16 +371,28 @@ class ConversationModel:
     - How to handle pagination of results
     - How to optimize for the most recent conversations
     """
+
+    # conversation_id -> (retention_seconds, expires_at)
+    _retention_cache: Dict[int, tuple] = {}
     
     @staticmethod
+    @single_flight('get_user_conversations')
     async def get_user_conversations(user_id: int, page: int = 1, limit: int = 20):
         offset = (page - 1) * limit
         query = '''
             SELECT * FROM user_conversations WHERE user_id = %(user_id)s ORDER BY last_message_at DESC, conversation_id ASC LIMIT %(limit)s
         '''
         params = {'user_id': user_id, 'limit': offset + limit}
-        loop = asyncio.get_event_loop()
-        rows = await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        rows = await _execute('conversation_read', query, params)
+        # Large groups are not fanned out to user_conversations; merge them in at read time
+        group_ids = await GroupModel.get_read_fanout_groups(user_id)
+        if group_ids:
+            groups = await asyncio.gather(*[ConversationModel.get_conversation(cid) for cid in group_ids])
+            rows = sorted(
+                rows + [GroupModel.as_user_conversation(group) for group in groups if group and group.get('last_message_at')],
+                key=lambda row: row['last_message_at'],
+                reverse=True
+            )
         return rows[offset:offset+limit]
     
     @staticmethod
@@ -91,30 +401,30 @@ class ConversationModel:
             SELECT * FROM conversations WHERE conversation_id = %(conversation_id)s
         '''
         params = {'conversation_id': conversation_id}
-        loop = asyncio.get_event_loop()
-        rows = await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        rows = await _execute('conversation_read', query, params)
         return rows[0] if rows else None
     
     @staticmethod
     async def create_or_get_conversation(user1_id: int, user2_id: int):
+        """
+        Returns (conversation_id, last_message_at, created), where created is True if the
+        conversation is new and last_message_at is the time of its previous message.
+        """
         # Try to find an existing conversation
         query = '''
-            SELECT conversation_id FROM conversations WHERE (user1_id = %(user1_id)s AND user2_id = %(user2_id)s) OR (user1_id = %(user2_id)s AND user2_id = %(user1_id)s) LIMIT 1
+            SELECT conversation_id, last_message_at FROM conversations WHERE (user1_id = %(user1_id)s AND user2_id = %(user2_id)s) OR (user1_id = %(user2_id)s AND user2_id = %(user1_id)s) LIMIT 1
         '''
         params = {'user1_id': user1_id, 'user2_id': user2_id}
-        loop = asyncio.get_event_loop()
-        rows = await loop.run_in_executor(None, cassandra_client.execute, query, params)
+        rows = await _execute('conversation_read', query, params)
         if rows:
-            return rows[0]['conversation_id']
+            return rows[0]['conversation_id'], rows[0]['last_message_at'], False
         # If not found, create a new conversation
-        import time
-        import random
-        conversation_id = int(time.time() * 1000) + random.randint(0, 999)
+        conversation_id = new_conversation_id()
         insert_query = '''
             INSERT INTO conversations (conversation_id, user1_id, user2_id, last_message_at, last_message_content)
             VALUES (%(conversation_id)s, %(user1_id)s, %(user2_id)s, %(last_message_at)s, %(last_message_content)s)
         '''
-        now = datetime.now(datetime.UTC)
+        now = datetime.utcnow()
         insert_params = {
             'conversation_id': conversation_id,
             'user1_id': user1_id,
@@ -122,5 +432,395 @@ class ConversationModel:
             'last_message_at': now,
             'last_message_content': ''
         }
-        await loop.run_in_executor(None, cassandra_client.execute, insert_query, insert_params)
-        return conversation_id 
\ No newline at end of file
+        await _execute('conversation_write', insert_query, insert_params)
+        return conversation_id, now, True
+
+    @staticmethod
+    def inbox_upsert(insert_query: str, last_message_at: datetime, previous_message_at: Optional[datetime]) -> str:
+        """
+        user_conversations is clustered on last_message_at, so moving a conversation up an
+        inbox means deleting its row at previous_message_at. Both statements hit the same
+        user partition, so the batch applies atomically.
+        """
+        if previous_message_at is None or to_millis(previous_message_at) == to_millis(last_message_at):
+            # Same clustering key: the insert overwrites in place, and a delete in the
+            # same batch would win the timestamp tie
+            return insert_query
+        return (
+            "BEGIN UNLOGGED BATCH\n"
+            "DELETE FROM user_conversations WHERE user_id = %(user_id)s AND last_message_at = %(previous_message_at)s "
+            "AND conversation_id = %(conversation_id)s;\n"
+            f"{insert_query.strip()};\nAPPLY BATCH"
+        )
+
+    @staticmethod
+    async def update_last_message(
+        conversation_id: int,
+        sender_id: int,
+        receiver_id: int,
+        content: str,
+        last_message_at: datetime,
+        previous_message_at: Optional[datetime] = None
+    ):
+        content = preview(content)
+        # Update conversation metadata (last_message_at, last_message_content)
+        update_query = '''
+            UPDATE conversations SET last_message_at = %(last_message_at)s, last_message_content = %(last_message_content)s WHERE conversation_id = %(conversation_id)s
+        '''
+        update_params = {
+            'last_message_at': last_message_at,
+            'last_message_content': content,
+            'conversation_id': conversation_id
+        }
+        await _execute('conversation_write', update_query, update_params)
+        # Also move the conversation to the top of both users' inboxes
+        upsert_user_conv = ConversationModel.inbox_upsert('''
+            INSERT INTO user_conversations (user_id, conversation_id, other_user_id, last_message_at, last_message_content)
+            VALUES (%(user_id)s, %(conversation_id)s, %(other_user_id)s, %(last_message_at)s, %(last_message_content)s)
+        ''', last_message_at, previous_message_at)
+        for uid, oid in [(sender_id, receiver_id), (receiver_id, sender_id)]:
+            upsert_params = {
+                'user_id': uid,
+                'conversation_id': conversation_id,
+                'other_user_id': oid,
+                'last_message_at': last_message_at,
+                'last_message_content': content,
+                'previous_message_at': previous_message_at
+            }
+            await _execute('conversation_write', upsert_user_conv, upsert_params)
+
+    @staticmethod
+    def _cache_retention(conversation_id: int, retention: int):
+        cache = ConversationModel._retention_cache
+        now = time.monotonic()
+        if conversation_id not in cache and len(cache) >= RETENTION_CACHE_MAX_ENTRIES:
+            for cid in [cid for cid, (_, expires_at) in cache.items() if expires_at <= now]:
+                del cache[cid]
+            # Still full: drop the oldest tenth so the sweep is not repeated on every insert
+            while len(cache) >= RETENTION_CACHE_MAX_ENTRIES * 0.9:
+                del cache[next(iter(cache))]
+        cache.pop(conversation_id, None)
+        cache[conversation_id] = (retention, now + RETENTION_CACHE_SECONDS)
+
+    @staticmethod
+    async def get_retention(conversation_id: int) -> int:
+        """Message retention of a conversation in seconds, 0 meaning forever."""
+        cached = ConversationModel._retention_cache.get(conversation_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        query = '''
+            SELECT retention_seconds FROM conversations WHERE conversation_id = %(conversation_id)s
+        '''
+        rows = await _execute('conversation_read', query, {'conversation_id': conversation_id})
+        retention = rows[0].get('retention_seconds') if rows else None
+        if retention is None:
+            retention = MESSAGE_DEFAULT_RETENTION_SECONDS
+        ConversationModel._cache_retention(conversation_id, retention)
+        return retention
+
+    @staticmethod
+    async def set_retention(conversation_id: int, retention_seconds: int):
+        query = '''
+            UPDATE conversations SET retention_seconds = %(retention_seconds)s WHERE conversation_id = %(conversation_id)s
+        '''
+        params = {'retention_seconds': retention_seconds, 'conversation_id': conversation_id}
+        await _execute('conversation_write', query, params)
+        ConversationModel._cache_retention(conversation_id, retention_seconds)
+
+
+class GroupModel:
+    """
+    Group conversations: members live in conversation_participants, and each
+    member's groups in user_groups. Groups up to GROUP_FANOUT_WRITE_MAX_MEMBERS
+    push every new message into the members' user_conversations rows
+    (fan-out-on-write); larger groups only update their conversations row and
+    are merged into inboxes at read time (fan-out-on-read).
+    """
+
+    FANOUT_WRITE = 'write'
+    FANOUT_READ = 'read'
+
+    @staticmethod
+    def fanout_mode_for(member_count: int) -> str:
+        if member_count <= GROUP_FANOUT_WRITE_MAX_MEMBERS:
+            return GroupModel.FANOUT_WRITE
+        return GroupModel.FANOUT_READ
+
+    @staticmethod
+    def as_user_conversation(group: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a conversations row like a user_conversations row for inbox merging."""
+        return {
+            'conversation_id': group['conversation_id'],
+            'other_user_id': None,
+            'last_message_at': group['last_message_at'],
+            'last_message_content': group.get('last_message_content'),
+            'is_group': True,
+            'name': group.get('name')
+        }
+
+    @staticmethod
+    async def create_group(creator_id: int, name: str, member_ids: List[int]):
+        members = sorted(set(member_ids) | {creator_id})
+        mode = GroupModel.fanout_mode_for(len(members))
+        conversation_id = new_conversation_id()
+        now = datetime.utcnow()
+        insert_query = '''
+            INSERT INTO conversations (conversation_id, user1_id, last_message_at, last_message_content, is_group, name, fanout_mode, participant_count)
+            VALUES (%(conversation_id)s, %(creator_id)s, %(last_message_at)s, %(last_message_content)s, true, %(name)s, %(fanout_mode)s, %(participant_count)s)
+        '''
+        insert_params = {
+            'conversation_id': conversation_id,
+            'creator_id': creator_id,
+            'last_message_at': now,
+            'last_message_content': '',
+            'name': name,
+            'fanout_mode': mode,
+            'participant_count': len(members)
+        }
+        await _execute('conversation_write', insert_query, insert_params)
+        participant_query = '''
+            INSERT INTO conversation_participants (conversation_id, user_id, joined_at)
+            VALUES (%(conversation_id)s, %(user_id)s, %(joined_at)s)
+        '''
+        membership_query = '''
+            INSERT INTO user_groups (user_id, conversation_id, fanout_mode, joined_at)
+            VALUES (%(user_id)s, %(conversation_id)s, %(fanout_mode)s, %(joined_at)s)
+        '''
+        await _execute_chunked('conversation_write', [
+            (query, {
+                'conversation_id': conversation_id,
+                'user_id': uid,
+                'fanout_mode': mode,
+                'joined_at': now
+            })
+            for uid in members
+            for query in (participant_query, membership_query)
+        ])
+        if mode == GroupModel.FANOUT_WRITE:
+            await GroupModel._fan_out(conversation_id, members, name, '', now)
+        await CounterModel.add_user_conversations(members)
+        return {'conversation_id': conversation_id, 'fanout_mode': mode, 'participants': members, 'created_at': now}
+
+    @staticmethod
+    async def get_participants(conversation_id: int) -> List[int]:
+        query = '''
+            SELECT user_id FROM conversation_participants WHERE conversation_id = %(conversation_id)s
+        '''
+        rows = await _execute('conversation_read', query, {'conversation_id': conversation_id})
+        return [row['user_id'] for row in rows]
+
+    @staticmethod
+    async def is_participant(conversation_id: int, user_id: int) -> bool:
+        query = '''
+            SELECT user_id FROM conversation_participants WHERE conversation_id = %(conversation_id)s AND user_id = %(user_id)s
+        '''
+        rows = await _execute('conversation_read', query, {'conversation_id': conversation_id, 'user_id': user_id})
+        return bool(rows)
+
+    @staticmethod
+    async def get_read_fanout_groups(user_id: int) -> List[int]:
+        """IDs of the user's groups that are merged into the inbox at read time."""
+        query = '''
+            SELECT conversation_id, fanout_mode FROM user_groups WHERE user_id = %(user_id)s
+        '''
+        rows = await _execute('conversation_read', query, {'user_id': user_id})
+        return [row['conversation_id'] for row in rows if row.get('fanout_mode') == GroupModel.FANOUT_READ]
+
+    @staticmethod
+    async def update_last_message(group: Dict[str, Any], content: str, last_message_at: datetime):
+        """group is the conversations row as read before this message, holding the previous last_message_at."""
+        content = preview(content)
+        update_query = '''
+            UPDATE conversations SET last_message_at = %(last_message_at)s, last_message_content = %(last_message_content)s WHERE conversation_id = %(conversation_id)s
+        '''
+        update_params = {
+            'last_message_at': last_message_at,
+            'last_message_content': content,
+            'conversation_id': group['conversation_id']
+        }
+        await _execute('conversation_write', update_query, update_params)
+        if group.get('fanout_mode') == GroupModel.FANOUT_WRITE:
+            members = await GroupModel.get_participants(group['conversation_id'])
+            await GroupModel._fan_out(
+                group['conversation_id'], members, group.get('name'), content, last_message_at, group.get('last_message_at')
+            )
+
+    @staticmethod
+    async def _fan_out(
+        conversation_id: int,
+        members: List[int],
+        name: Optional[str],
+        content: str,
+        last_message_at: datetime,
+        previous_message_at: Optional[datetime] = None
+    ):
+        upsert_user_conv = ConversationModel.inbox_upsert('''
+            INSERT INTO user_conversations (user_id, conversation_id, last_message_at, last_message_content, is_group, name)
+            VALUES (%(user_id)s, %(conversation_id)s, %(last_message_at)s, %(last_message_content)s, true, %(name)s)
+        ''', last_message_at, previous_message_at)
+        await _execute_chunked('conversation_write', [
+            (upsert_user_conv, {
+                'user_id': uid,
+                'conversation_id': conversation_id,
+                'last_message_at': last_message_at,
+                'last_message_content': content,
+                'name': name,
+                'previous_message_at': previous_message_at
+            })
+            for uid in members
+        ])
+
+
+class ReadReceiptModel:
+    """
+    Per-(user, conversation) read watermarks in the read_receipts table.
+    Updates go through read_receipt_buffer, which keeps only the highest
+    watermark per key and writes them out in periodic batches. Rows are
+    written with the watermark's own time as the write timestamp, so
+    Cassandra's last-write-wins keeps the highest watermark even when a
+    lower one arrives from another worker or after a restart.
+    """
+
+    @staticmethod
+    def mark_read(conversation_id: int, user_id: int, created_at: datetime, message_id) -> bool:
+        """Buffer a watermark. Returns False if it is not ahead of the user's current one."""
+        # Naive UTC at millisecond precision, as stored and as returned by the driver
+        created_at = from_millis(to_millis(created_at))
+        return read_receipt_buffer.update((conversation_id, user_id), (created_at, message_id))
+
+    @staticmethod
+    async def get_watermark(conversation_id: int, user_id: int) -> Optional[tuple]:
+        """(created_at, message_id) of the user's highest known watermark, if any."""
+        query = '''
+            SELECT last_read_at, last_read_message_id FROM read_receipts
+            WHERE conversation_id = %(conversation_id)s AND user_id = %(user_id)s
+        '''
+        rows = await _execute('receipt_read', query, {'conversation_id': conversation_id, 'user_id': user_id})
+        stored = (rows[0]['last_read_at'], rows[0]['last_read_message_id']) if rows else None
+        local = read_receipt_buffer.current((conversation_id, user_id))
+        if stored is None or (local is not None and local[0] > stored[0]):
+            return local
+        return stored
+
+    @staticmethod
+    async def save_watermarks(batch: Dict[tuple, tuple]):
+        """Write a flushed batch in chunks, so a large flush stays within the receipt_write queue."""
+        query = '''
+            INSERT INTO read_receipts (conversation_id, user_id, last_read_at, last_read_message_id, updated_at)
+            VALUES (%(conversation_id)s, %(user_id)s, %(last_read_at)s, %(last_read_message_id)s, %(updated_at)s)
+            USING TIMESTAMP %(write_timestamp)s
+        '''
+        now = datetime.utcnow()
+        items = list(batch.items())
+        for start in range(0, len(items), READ_RECEIPT_FLUSH_CONCURRENCY):
+            await asyncio.gather(*[
+                _execute('receipt_write', query, {
+                    'conversation_id': conversation_id,
+                    'user_id': user_id,
+                    'last_read_at': created_at,
+                    'last_read_message_id': message_id,
+                    'updated_at': now,
+                    # Microseconds; a lower watermark loses to a higher one regardless of write order
+                    'write_timestamp': to_millis(created_at) * 1000
+                })
+                for (conversation_id, user_id), (created_at, message_id) in items[start:start + READ_RECEIPT_FLUSH_CONCURRENCY]
+            ])
+
+    @staticmethod
+    async def get_watermarks(conversation_id: int) -> List[Dict[str, Any]]:
+        """Read watermarks of all users in a conversation, including ones not yet flushed."""
+        query = '''
+            SELECT user_id, last_read_at, last_read_message_id FROM read_receipts WHERE conversation_id = %(conversation_id)s
+        '''
+        rows = await _execute('receipt_read', query, {'conversation_id': conversation_id})
+        marks = {row['user_id']: row for row in rows}
+        for (_, user_id), (created_at, message_id) in read_receipt_buffer.pending_in(conversation_id).items():
+            current = marks.get(user_id)
+            if current is None or created_at > current['last_read_at']:
+                marks[user_id] = {'user_id': user_id, 'last_read_at': created_at, 'last_read_message_id': message_id}
+        return list(marks.values())
+
+
+
+class AttachmentModel:
+    """
+    Metadata of content-addressed attachment blobs. The bytes live in the
+    blob store; a row per blob ID records its size and content type.
+    """
+
+    @staticmethod
+    async def save_attachment(blob_id: str, size: int, content_type: str, created_at: datetime):
+        query = '''
+            INSERT INTO attachments (blob_id, size, content_type, created_at)
+            VALUES (%(blob_id)s, %(size)s, %(content_type)s, %(created_at)s)
+        '''
+        params = {'blob_id': blob_id, 'size': size, 'content_type': content_type, 'created_at': created_at}
+        await _execute('attachment_write', query, params)
+
+    @staticmethod
+    async def get_attachment(blob_id: str) -> Optional[Dict[str, Any]]:
+        query = '''
+            SELECT * FROM attachments WHERE blob_id = %(blob_id)s
+        '''
+        rows = await _execute('attachment_read', query, {'blob_id': blob_id})
+        return rows[0] if rows else None
+
+
+class CounterModel:
+    """
+    Message counts per conversation and conversation counts per user, kept
+    in counter tables so paginated reads can return a total without a
+    COUNT(*) over the partition. Counter updates are not idempotent and do
+    not expire with message TTLs; scripts/reconcile_counts.py corrects drift.
+    """
+
+    @staticmethod
+    def _batch(statements: List[str]) -> str:
+        return "BEGIN COUNTER BATCH\n" + ";\n".join(statements) + ";\nAPPLY BATCH"
+
+    @staticmethod
+    async def record_message(conversation_id: int, new_conversation_user_ids: List[int] = ()):
+        """Count a new message, and the conversation itself for users it was just created for, in one batch."""
+        statements = [
+            'UPDATE conversation_message_counts SET message_count = message_count + 1 WHERE conversation_id = %(conversation_id)s'
+        ]
+        params = {'conversation_id': conversation_id}
+        for i, user_id in enumerate(new_conversation_user_ids):
+            statements.append(
+                f'UPDATE user_conversation_counts SET conversation_count = conversation_count + 1 WHERE user_id = %(user_id_{i})s'
+            )
+            params[f'user_id_{i}'] = user_id
+        await _execute('counter_write', CounterModel._batch(statements), params)
+
+    @staticmethod
+    async def add_user_conversations(user_ids: List[int]):
+        """Count a new conversation for each user, in batches of COUNTER_BATCH_SIZE."""
+        batches = []
+        for start in range(0, len(user_ids), COUNTER_BATCH_SIZE):
+            chunk = user_ids[start:start + COUNTER_BATCH_SIZE]
+            statements = [
+                f'UPDATE user_conversation_counts SET conversation_count = conversation_count + 1 WHERE user_id = %(user_id_{i})s'
+                for i in range(len(chunk))
+            ]
+            params = {f'user_id_{i}': user_id for i, user_id in enumerate(chunk)}
+            batches.append(_execute('counter_write', CounterModel._batch(statements), params))
+        await asyncio.gather(*batches)
+
+    @staticmethod
+    async def get_message_count(conversation_id: int) -> int:
+        query = '''
+            SELECT message_count FROM conversation_message_counts WHERE conversation_id = %(conversation_id)s
+        '''
+        rows = await _execute('counter_read', query, {'conversation_id': conversation_id})
+        return rows[0]['message_count'] if rows else 0
+
+    @staticmethod
+    async def get_conversation_count(user_id: int) -> int:
+        query = '''
+            SELECT conversation_count FROM user_conversation_counts WHERE user_id = %(user_id)s
+        '''
+        rows = await _execute('counter_read', query, {'user_id': user_id})
+        return rows[0]['conversation_count'] if rows else 0
+
+# Create a global instance
+read_receipt_buffer = WatermarkBuffer(ReadReceiptModel.save_watermarks)
\ No newline at end of file
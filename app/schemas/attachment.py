@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+class AttachmentResponse(BaseModel):
+    id: str = Field(..., description="Content-addressed ID (SHA-256) of the attachment")
+    size: int = Field(..., description="Size of the attachment in bytes")
+    content_type: str = Field(..., description="Media type of the attachment")
+    created_at: datetime = Field(..., description="Timestamp when the attachment was first uploaded")
+    deduplicated: bool = Field(False, description="Whether identical content was already stored")
\ No newline at end of file
@@ -1,14 +1,16 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
-from app.schemas.message import MessageResponse
+from app.schemas.message import MessageResponse, ConversationId
 
 class ConversationResponse(BaseModel):
-    id: int = Field(..., description="Unique ID of the conversation")
-    user1_id: int = Field(..., description="ID of the first user")
-    user2_id: int = Field(..., description="ID of the second user")
+    id: ConversationId = Field(..., description="Unique ID of the conversation")
+    user1_id: Optional[int] = Field(None, description="ID of the first user (the creator for groups)")
+    user2_id: Optional[int] = Field(None, description="ID of the second user, absent for groups")
     last_message_at: datetime = Field(..., description="Timestamp of the last message")
     last_message_content: Optional[str] = Field(None, description="Content of the last message")
+    is_group: bool = Field(False, description="Whether this is a group conversation")
+    name: Optional[str] = Field(None, description="Name of the group")
 
 class ConversationDetail(ConversationResponse):
     messages: List[MessageResponse] = Field(..., description="List of messages in conversation")
@@ -21,4 +23,21 @@ class PaginatedConversationResponse(BaseModel):
     total: int = Field(..., description="Total number of conversations")
     page: int = Field(..., description="Current page number")
     limit: int = Field(..., description="Number of items per page")
-    data: List[ConversationResponse] = Field(..., description="List of conversations") 
\ No newline at end of file
+    data: List[ConversationResponse] = Field(..., description="List of conversations")
+
+class ConversationRetentionUpdate(BaseModel):
+    retention_seconds: int = Field(..., ge=0, description="How long messages are kept, in seconds (0 = forever)")
+
+class ConversationRetentionResponse(BaseModel):
+    conversation_id: ConversationId = Field(..., description="ID of the conversation")
+    retention_seconds: int = Field(..., description="How long messages are kept, in seconds (0 = forever)")
+
+class GroupCreate(BaseModel):
+    creator_id: int = Field(..., description="ID of the user creating the group")
+    name: str = Field(..., min_length=1, description="Name of the group")
+    member_ids: List[int] = Field(..., description="IDs of the other members")
+
+class GroupParticipantsResponse(BaseModel):
+    conversation_id: ConversationId = Field(..., description="ID of the group conversation")
+    fanout_mode: str = Field(..., description="'write' (pushed to member inboxes) or 'read' (merged at inbox read time)")
+    participants: List[int] = Field(..., description="IDs of the members")
\ No newline at end of file
@@ -1,28 +1,58 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, PlainSerializer, model_validator
+from typing import Optional, List, Annotated
 from datetime import datetime
 
+# Conversation IDs are Snowflake IDs above 2^53, which JavaScript numbers cannot hold exactly,
+# so responses carry them as strings; requests accept either form
+ConversationId = Annotated[int, PlainSerializer(str, return_type=str, when_used="json")]
+
 class MessageBase(BaseModel):
     content: str = Field(..., description="Content of the message")
 
 class MessageCreate(MessageBase):
     sender_id: int = Field(..., description="ID of the sender")
-    receiver_id: int = Field(..., description="ID of the receiver")
+    receiver_id: Optional[int] = Field(None, description="ID of the receiver (1:1 messages)")
+    conversation_id: Optional[ConversationId] = Field(None, description="ID of the group conversation (group messages)")
+    attachment_id: Optional[str] = Field(None, description="ID of an uploaded attachment")
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if self.receiver_id is None and self.conversation_id is None:
+            raise ValueError("Either receiver_id or conversation_id is required")
+        return self
 
 class MessageResponse(MessageBase):
-    id: int = Field(..., description="Unique ID of the message")
+    id: str = Field(..., description="Unique ID of the message")
     sender_id: int = Field(..., description="ID of the sender")
-    receiver_id: int = Field(..., description="ID of the receiver")
+    receiver_id: Optional[int] = Field(None, description="ID of the receiver, absent for group messages")
     created_at: datetime = Field(..., description="Timestamp when message was created")
-    conversation_id: int = Field(..., description="ID of the conversation")
+    conversation_id: ConversationId = Field(..., description="ID of the conversation")
+    attachment_id: Optional[str] = Field(None, description="ID of the message's attachment, if any")
 
 class PaginatedMessageRequest(BaseModel):
     page: int = Field(1, description="Page number for pagination")
     limit: int = Field(20, description="Number of items per page")
     before_timestamp: Optional[datetime] = Field(None, description="Get messages before this timestamp")
 
+class ReadReceiptResponse(BaseModel):
+    conversation_id: ConversationId = Field(..., description="ID of the conversation")
+    user_id: int = Field(..., description="ID of the user")
+    last_read_message_id: str = Field(..., description="ID of the last message the user has read")
+    last_read_at: datetime = Field(..., description="Timestamp of the last message the user has read")
+
+class MarkReadRequest(BaseModel):
+    user_id: int = Field(..., description="ID of the user")
+    message_id: str = Field(..., description="ID of the last message read")
+    created_at: datetime = Field(..., description="Timestamp of the last message read")
+
 class PaginatedMessageResponse(BaseModel):
     total: int = Field(..., description="Total number of messages")
     page: int = Field(..., description="Current page number")
     limit: int = Field(..., description="Number of items per page")
-    data: List[MessageResponse] = Field(..., description="List of messages") 
\ No newline at end of file
+    data: List[MessageResponse] = Field(..., description="List of messages")
+    read_receipts: Optional[List[ReadReceiptResponse]] = Field(None, description="Read watermarks of the conversation's users")
+
+class FeedResponse(BaseModel):
+    limit: int = Field(..., description="Number of items per page")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, absent when the feed is exhausted")
+    data: List[MessageResponse] = Field(..., description="Messages across conversations, newest first")
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Script to move cold message history out of the hot messages table.
+Messages older than the cutoff are appended to compressed segment files
+under ARCHIVE_DIR (see app/core/archive.py) and then range-deleted from
+Cassandra, together with their search postings: search only covers the
+messages table. Messages written with a TTL keep their expiry in the
+archive, and segments whose messages have all expired are deleted. Runs are
+incremental: only messages newer than the last archived block of each
+conversation are copied.
+"""
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement, dict_factory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.archive import MessageArchive, ARCHIVE_DIR, to_millis
+from app.core.compression import decode_content
+from app.core.tokenizer import get_tokenizer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cassandra connection settings
+CASSANDRA_HOST = os.getenv("CASSANDRA_HOST", "localhost")
+CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
+CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "messenger")
+
+# Archive configuration
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))  # Hot window
+ARCHIVE_BLOCK_MESSAGES = int(os.getenv("ARCHIVE_BLOCK_MESSAGES", "256"))  # Messages per compressed block
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", "4"))  # Conversations archived in parallel
+ARCHIVE_DELETE_CONCURRENCY = int(os.getenv("ARCHIVE_DELETE_CONCURRENCY", "64"))  # In-flight posting deletes
+SEARCH_MAX_TOKENS_PER_MESSAGE = int(os.getenv("SEARCH_MAX_TOKENS_PER_MESSAGE", "64"))
+
+DELETE_POSTING = '''
+    DELETE FROM message_search_index
+    WHERE scope = ? AND scope_id = ? AND token = ? AND created_at = ? AND conversation_id = ? AND message_id = ?
+'''
+
+def connect_to_cassandra():
+    """Connect to Cassandra cluster."""
+    logger.info("Connecting to Cassandra...")
+    try:
+        cluster = Cluster([CASSANDRA_HOST], port=CASSANDRA_PORT)
+        session = cluster.connect(CASSANDRA_KEYSPACE)
+        session.row_factory = dict_factory
+        logger.info("Connected to Cassandra!")
+        return cluster, session
+    except Exception as e:
+        logger.error(f"Failed to connect to Cassandra: {str(e)}")
+        raise
+
+def posting_keys(conversation_id, row, tokenizer):
+    """Primary keys of a message's search postings, as written by SearchIndexModel.index_message."""
+    tokens = tokenizer.tokenize(row['content'])[:SEARCH_MAX_TOKENS_PER_MESSAGE]
+    scopes = [('conversation', conversation_id)]
+    scopes += [('user', uid) for uid in {row['sender_id'], row['receiver_id']} if uid is not None]
+    return [
+        (scope, scope_id, token, row['created_at'], conversation_id, row['message_id'])
+        for scope, scope_id in scopes
+        for token in tokens
+    ]
+
+def delete_postings(session, delete_statement, conversation_id, rows):
+    """Remove the search postings of archived messages, which search could no longer load."""
+    tokenizer = get_tokenizer()
+    keys = [key for row in rows for key in posting_keys(conversation_id, row, tokenizer)]
+    if keys:
+        execute_concurrent_with_args(session, delete_statement, keys, concurrency=ARCHIVE_DELETE_CONCURRENCY)
+
+def archive_conversation(session, archive, conversation_id, cutoff, block_size, delete, delete_statement=None):
+    """Archive one conversation's messages older than cutoff. Returns the number archived."""
+    purged = archive.purge_expired(conversation_id)
+    if purged:
+        logger.info(f"Purged {purged} expired archived messages from conversation {conversation_id}")
+    if delete and delete_statement is None:
+        delete_statement = session.prepare(DELETE_POSTING)
+    last_archived = archive.last_archived_at(conversation_id)
+    # Blocks are cut by count, so the last run may have stopped partway through a
+    # millisecond: resume at that millisecond and skip the rows already archived
+    already_archived = archive.archived_ids_at(conversation_id, to_millis(last_archived)) if last_archived else set()
+    query = (
+        "SELECT created_at, message_id, sender_id, receiver_id, content, content_encoding, content_blob, attachment_id, "
+        "TTL(sender_id) AS ttl FROM messages WHERE conversation_id = %(conversation_id)s AND created_at < %(cutoff)s"
+    )
+    params = {'conversation_id': conversation_id, 'cutoff': cutoff}
+    if last_archived is not None:
+        query += " AND created_at >= %(last_archived)s"
+        params['last_archived'] = last_archived
+    statement = SimpleStatement(query + " ORDER BY created_at ASC, message_id DESC", fetch_size=block_size)
+    archived = 0
+    block = []
+    now = datetime.utcnow()
+
+    def flush(block):
+        archive.append_block(conversation_id, block)
+        if delete:
+            delete_postings(session, delete_statement, conversation_id, block)
+        return len(block)
+
+    for row in session.execute(statement, params):
+        if already_archived and row['created_at'] == last_archived and str(row['message_id']) in already_archived:
+            continue
+        row['content'] = decode_content(row)
+        # Remaining TTL at read time; None for messages that never expire
+        row['expires_at'] = now + timedelta(seconds=row['ttl']) if row.get('ttl') else None
+        block.append(row)
+        if len(block) >= block_size:
+            archived += flush(block)
+            block = []
+    if block:
+        archived += flush(block)
+    if delete and (archived or last_archived is not None):
+        session.execute(
+            "DELETE FROM messages WHERE conversation_id = %(conversation_id)s AND created_at < %(cutoff)s",
+            {'conversation_id': conversation_id, 'cutoff': min(cutoff, archive.last_archived_at(conversation_id) + timedelta(milliseconds=1))}
+        )
+    return archived
+
+def run_archiver(session, archive, cutoff, block_size, workers, delete):
+    """Archive all conversations."""
+    delete_statement = session.prepare(DELETE_POSTING) if delete else None
+    conversation_ids = [row['conversation_id'] for row in session.execute("SELECT conversation_id FROM conversations")]
+    logger.info(f"Archiving messages older than {cutoff.isoformat()} from {len(conversation_ids)} conversations into {archive.root}...")
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(archive_conversation, session, archive, cid, cutoff, block_size, delete, delete_statement): cid
+            for cid in conversation_ids
+        }
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                count = future.result()
+                total += count
+                if count:
+                    logger.info(f"Archived {count} messages from conversation {cid}")
+            except Exception as e:
+                logger.error(f"Failed to archive conversation {cid}: {str(e)}")
+    logger.info(f"Archived {total} messages in total")
+
+def main():
+    """Main function to archive cold message history."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS, help="Archive messages older than this many days")
+    parser.add_argument("--block-size", type=int, default=ARCHIVE_BLOCK_MESSAGES, help="Messages per compressed block")
+    parser.add_argument("--workers", type=int, default=ARCHIVE_WORKERS, help="Conversations archived in parallel")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Directory holding the segment files")
+    parser.add_argument("--keep", action="store_true", help="Copy into the archive without deleting from Cassandra")
+    args = parser.parse_args()
+
+    cluster = None
+
+    try:
+        cluster, session = connect_to_cassandra()
+        cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+        run_archiver(session, MessageArchive(args.archive_dir), cutoff, args.block_size, args.workers, not args.keep)
+        logger.info("Archiving completed successfully!")
+    except Exception as e:
+        logger.error(f"Error during archiving: {str(e)}")
+    finally:
+        if cluster:
+            cluster.shutdown()
+            logger.info("Cassandra connection closed")
+
+if __name__ == "__main__":
+    main()
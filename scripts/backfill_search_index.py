@@ -0,0 +1,132 @@
+"""
+Script to build the message search index from existing message history.
+Conversations are indexed in parallel; each conversation is paged through
+and its postings are written with the driver's concurrent execution helper.
+Postings are keyed by message, so re-indexing a conversation is idempotent;
+--conversation-id limits a run to the conversations listed as failed by
+/api/admin/search-index.
+"""
+import os
+import sys
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.tokenizer import get_tokenizer
+from app.core.compression import decode_content
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cassandra connection settings
+CASSANDRA_HOST = os.getenv("CASSANDRA_HOST", "localhost")
+CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
+CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "messenger")
+
+# Backfill configuration
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "8"))  # Conversations indexed in parallel
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "64"))  # In-flight writes per conversation
+BACKFILL_FETCH_SIZE = int(os.getenv("BACKFILL_FETCH_SIZE", "500"))  # Messages read per page
+SEARCH_MAX_TOKENS_PER_MESSAGE = int(os.getenv("SEARCH_MAX_TOKENS_PER_MESSAGE", "64"))
+
+# Postings expire with their message; TTL 0 means no expiry
+INSERT_POSTING = '''
+    INSERT INTO message_search_index (scope, scope_id, token, created_at, conversation_id, message_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+    USING TTL ?
+'''
+
+def connect_to_cassandra():
+    """Connect to Cassandra cluster."""
+    logger.info("Connecting to Cassandra...")
+    try:
+        cluster = Cluster([CASSANDRA_HOST])
+        session = cluster.connect(CASSANDRA_KEYSPACE)
+        logger.info("Connected to Cassandra!")
+        return cluster, session
+    except Exception as e:
+        logger.error(f"Failed to connect to Cassandra: {str(e)}")
+        raise
+
+def postings_for_message(row, tokenizer):
+    """Build the index rows for a single message, expiring when the message does."""
+    tokens = tokenizer.tokenize(decode_content(row._asdict()))[:SEARCH_MAX_TOKENS_PER_MESSAGE]
+    scopes = [('conversation', row.conversation_id)]
+    scopes += [('user', uid) for uid in {row.sender_id, row.receiver_id} if uid is not None]
+    ttl = row.ttl or 0
+    return [
+        (scope, scope_id, token, row.created_at, row.conversation_id, row.message_id, ttl)
+        for scope, scope_id in scopes
+        for token in tokens
+    ]
+
+def index_conversation(session, insert_statement, conversation_id):
+    """Index every message of one conversation. Returns the number of messages indexed."""
+    tokenizer = get_tokenizer()
+    statement = SimpleStatement(
+        "SELECT conversation_id, created_at, message_id, sender_id, receiver_id, content, content_encoding, content_blob, "
+        "TTL(sender_id) AS ttl FROM messages WHERE conversation_id = %s",
+        fetch_size=BACKFILL_FETCH_SIZE
+    )
+    indexed = 0
+    postings = []
+    for row in session.execute(statement, (conversation_id,)):
+        postings.extend(postings_for_message(row, tokenizer))
+        indexed += 1
+        if len(postings) >= BACKFILL_FETCH_SIZE:
+            execute_concurrent_with_args(session, insert_statement, postings, concurrency=BACKFILL_CONCURRENCY)
+            postings = []
+    if postings:
+        execute_concurrent_with_args(session, insert_statement, postings, concurrency=BACKFILL_CONCURRENCY)
+    return indexed
+
+def backfill(session, conversation_ids=None):
+    """Index the given conversations, or all existing ones."""
+    insert_statement = session.prepare(INSERT_POSTING)
+    if not conversation_ids:
+        conversation_ids = [row.conversation_id for row in session.execute("SELECT conversation_id FROM conversations")]
+    logger.info(f"Indexing {len(conversation_ids)} conversations with {BACKFILL_WORKERS} workers...")
+    total = 0
+    with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as pool:
+        futures = {
+            pool.submit(index_conversation, session, insert_statement, cid): cid
+            for cid in conversation_ids
+        }
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                count = future.result()
+                total += count
+                logger.info(f"Indexed {count} messages in conversation {cid}")
+            except Exception as e:
+                logger.error(f"Failed to index conversation {cid}: {str(e)}")
+    logger.info(f"Indexed {total} messages in total")
+
+def main():
+    """Main function to backfill the search index."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--conversation-id", dest="conversation_ids", type=int, action="append",
+        help="Only index this conversation (repeatable)"
+    )
+    args = parser.parse_args()
+
+    cluster = None
+
+    try:
+        cluster, session = connect_to_cassandra()
+        backfill(session, args.conversation_ids)
+        logger.info("Search index backfill completed successfully!")
+    except Exception as e:
+        logger.error(f"Error during search index backfill: {str(e)}")
+    finally:
+        if cluster:
+            cluster.shutdown()
+            logger.info("Cassandra connection closed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark for compressed message content storage.
+Reports stored bytes and decode latency for each codec on a realistic mix of
+message content. With --cassandra, it also writes the same messages into a
+scratch table per codec and reports bytes on disk (from the table's size
+estimates after a flush) and partition read latency.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import logging
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.compression import encode_content, decode_content, zstandard, PLAIN, ZLIB, ZSTD
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cassandra connection settings
+CASSANDRA_HOST = os.getenv("CASSANDRA_HOST", "localhost")
+CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
+CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "messenger")
+
+WORDS = (
+    "the be to of and a in that have it for not on with he as you do at this but his by from they we say her "
+    "she or an will my one all would there their what so up out if about who get which go me when make can like "
+    "time no just him know take people into year your good some could them see other than then now look only "
+    "come its over think also back after use two how our work first well way even new want because any these "
+    "give day most us meeting tomorrow deploy review lunch weekend photo link thanks sounds great ok sure"
+).split()
+
+def random_sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 16))]
+    return " ".join(words).capitalize() + rng.choice([".", "!", "?", "..."])
+
+def random_message(rng):
+    """Mostly short chat lines, with a tail of long pastes (paragraphs, logs, JSON)."""
+    kind = rng.random()
+    if kind < 0.80:
+        return random_sentence(rng)
+    if kind < 0.95:
+        return " ".join(random_sentence(rng) for _ in range(rng.randint(5, 40)))
+    if kind < 0.98:
+        return "\n".join(
+            f"2024-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z INFO "
+            f"worker-{rng.randint(1, 8)} handled request id={uuid.uuid4()} in {rng.randint(1, 900)}ms"
+            for _ in range(rng.randint(20, 200))
+        )
+    return "[" + ",".join(
+        f'{{"id": {i}, "name": "{rng.choice(WORDS)}", "score": {rng.random():.4f}, "tags": ["{rng.choice(WORDS)}", "{rng.choice(WORDS)}"]}}'
+        for i in range(rng.randint(20, 150))
+    ) + "]"
+
+def available_codecs():
+    codecs = [PLAIN, ZLIB]
+    if zstandard is not None:
+        codecs.append(ZSTD)
+    return codecs
+
+def encode_all(messages, codec):
+    encoded = []
+    for content in messages:
+        if codec is PLAIN:
+            encoded.append({'content': content, 'content_encoding': None, 'content_blob': None})
+        else:
+            stored, encoding, blob = encode_content(content, codec=codec)
+            encoded.append({'content': stored, 'content_encoding': encoding, 'content_blob': blob})
+    return encoded
+
+def stored_bytes(row):
+    if row['content_blob'] is not None:
+        return len(row['content_blob'])
+    return len(row['content'].encode('utf-8'))
+
+def benchmark_offline(messages):
+    """Measure stored size and decode latency without a database."""
+    raw_bytes = sum(len(m.encode('utf-8')) for m in messages)
+    logger.info(f"{len(messages)} messages, {raw_bytes} raw bytes")
+    for codec in available_codecs():
+        rows = encode_all(messages, codec)
+        size = sum(stored_bytes(r) for r in rows)
+        compressed = sum(1 for r in rows if r['content_encoding'])
+        start = time.perf_counter()
+        for row in rows:
+            decode_content(row)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"codec={codec or 'plain':5} stored={size} bytes ratio={size / raw_bytes:.3f} "
+            f"compressed_rows={compressed} decode={elapsed / len(rows) * 1e6:.2f}us/msg"
+        )
+
+def benchmark_cassandra(messages, reads):
+    """Write the messages into one scratch table per codec and time partition reads."""
+    from cassandra.cluster import Cluster
+    from cassandra.query import SimpleStatement
+
+    cluster = Cluster([CASSANDRA_HOST], port=CASSANDRA_PORT)
+    session = cluster.connect(CASSANDRA_KEYSPACE)
+    tables = {codec: f"benchmark_messages_{codec or 'plain'}" for codec in available_codecs()}
+    try:
+        now = datetime.utcnow()
+        for codec, table in tables.items():
+            session.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket int,
+                    created_at timestamp,
+                    message_id uuid,
+                    content text,
+                    content_encoding text,
+                    content_blob blob,
+                    PRIMARY KEY ((bucket), created_at, message_id)
+                ) WITH CLUSTERING ORDER BY (created_at DESC, message_id ASC)
+            ''')
+            insert = session.prepare(f'''
+                INSERT INTO {table} (bucket, created_at, message_id, content, content_encoding, content_blob)
+                VALUES (0, ?, ?, ?, ?, ?)
+            ''')
+            for i, row in enumerate(encode_all(messages, codec)):
+                session.execute(insert, (now - timedelta(seconds=i), uuid.uuid4(), row['content'], row['content_encoding'], row['content_blob']))
+        logger.info(f"Run `nodetool flush {CASSANDRA_KEYSPACE}` and wait for size estimates to refresh, then press Enter")
+        input()
+        for codec, table in tables.items():
+            statement = SimpleStatement(f"SELECT * FROM {table} WHERE bucket = 0", fetch_size=5000)
+            timings = []
+            for _ in range(reads):
+                start = time.perf_counter()
+                for row in session.execute(statement):
+                    decode_content(row._asdict())
+                timings.append(time.perf_counter() - start)
+            size = session.execute(
+                "SELECT mean_partition_size FROM system.size_estimates WHERE keyspace_name = %s AND table_name = %s",
+                (CASSANDRA_KEYSPACE, table)
+            ).one()
+            logger.info(
+                f"codec={codec or 'plain':5} bytes_on_disk={size.mean_partition_size if size else 'n/a'} "
+                f"read p50={statistics.median(timings) * 1000:.2f}ms max={max(timings) * 1000:.2f}ms"
+            )
+    finally:
+        for table in tables.values():
+            session.execute(f"DROP TABLE IF EXISTS {table}")
+        cluster.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000, help="Number of messages to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--cassandra", action="store_true", help="Also benchmark against Cassandra")
+    parser.add_argument("--reads", type=int, default=20, help="Partition reads per codec with --cassandra")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [random_message(rng) for _ in range(args.messages)]
+    benchmark_offline(messages)
+    if args.cassandra:
+        benchmark_cassandra(messages, args.reads)
+
+if __name__ == "__main__":
+    main()
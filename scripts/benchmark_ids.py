@@ -0,0 +1,53 @@
+"""
+Benchmark for the Snowflake ID generator.
+Reports IDs per second for integer IDs and timeuuids, single-threaded and
+with several threads sharing one generator, and checks that no ID repeats.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.ids import IdGenerator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def generate(method, count):
+    return [method() for _ in range(count)]
+
+def run(name, method, count, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        ids = generate(method, count)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            chunks = pool.map(generate, [method] * threads, [count // threads] * threads)
+            ids = [value for chunk in chunks for value in chunk]
+    elapsed = time.perf_counter() - start
+    unique = len(set(ids))
+    logger.info(
+        f"{name:8} threads={threads} ids={len(ids)} {len(ids) / elapsed / 1e6:.2f}M ids/s "
+        f"duplicates={len(ids) - unique}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2_000_000, help="IDs to generate per run")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for the contended run")
+    args = parser.parse_args()
+
+    generator = IdGenerator(worker_id=1)
+    for threads in (1, args.threads):
+        run("bigint", generator.next_id, args.count, threads)
+        run("timeuuid", generator.next_timeuuid, args.count, threads)
+    start = time.perf_counter()
+    ids = generator.next_ids(args.count)
+    elapsed = time.perf_counter() - start
+    logger.info(f"bulk     threads=1 ids={len(ids)} {len(ids) / elapsed / 1e6:.2f}M ids/s duplicates={len(ids) - len(set(ids))}")
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,16 @@ Script to generate test data for the Messenger application.
 This script is a skeleton for students to implement.
 """
 import os
-import uuid
+import sys
 import logging
 import random
+import argparse
 from datetime import datetime, timedelta
 from cassandra.cluster import Cluster
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.ids import new_conversation_id, new_message_id, configure_id_generator, MAX_WORKER_ID
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,8 @@ CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "messenger")
 NUM_USERS = 10  # Number of users to create
 NUM_CONVERSATIONS = 15  # Number of conversations to create
 MAX_MESSAGES_PER_CONVERSATION = 50  # Maximum number of messages per conversation
+# ID worker for this script, distinct from the app's ID_WORKER_ID so both can run at once
+SCRIPT_ID_WORKER_ID = int(os.getenv("SCRIPT_ID_WORKER_ID", str(MAX_WORKER_ID)))
 
 def connect_to_cassandra():
     """Connect to Cassandra cluster."""
@@ -50,7 +56,7 @@ def generate_test_data(session):
         pairs.add(pair)
     for user1_id, user2_id in pairs:
         # Create a unique conversation_id
-        conversation_id = int(now.timestamp() * 1000) + random.randint(0, 99999)
+        conversation_id = new_conversation_id()
         conversation_ids.append(conversation_id)
         # Generate messages
         num_messages = random.randint(5, 20)
@@ -61,7 +67,7 @@ def generate_test_data(session):
             receiver_id = user2_id if i % 2 == 0 else user1_id
             created_at = now - timedelta(minutes=num_messages - i)
             content = f"Test message {i+1} from {sender_id} to {receiver_id}"
-            message_id = uuid.uuid4()
+            message_id = new_message_id()
             messages.append((conversation_id, created_at, message_id, sender_id, receiver_id, content))
             last_message_at = created_at
         # Insert messages
@@ -81,6 +87,14 @@ def generate_test_data(session):
                 INSERT INTO user_conversations (user_id, conversation_id, other_user_id, last_message_at, last_message_content)
                 VALUES (%s, %s, %s, %s, %s)
             ''', (uid, conversation_id, oid, last_message_at, messages[-1][5]))
+        # Keep the total counters in step with the rows written
+        session.execute('''
+            BEGIN COUNTER BATCH
+            UPDATE conversation_message_counts SET message_count = message_count + %s WHERE conversation_id = %s;
+            UPDATE user_conversation_counts SET conversation_count = conversation_count + 1 WHERE user_id = %s;
+            UPDATE user_conversation_counts SET conversation_count = conversation_count + 1 WHERE user_id = %s;
+            APPLY BATCH
+        ''', (len(messages), conversation_id, user1_id, user2_id))
     logger.info(f"Generated {len(conversation_ids)} conversations with messages")
     logger.info(f"User IDs: {user_ids}")
     logger.info(f"Conversation IDs: {conversation_ids}")
@@ -88,6 +102,11 @@ def generate_test_data(session):
 
 def main():
     """Main function to generate test data."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--worker-id", type=int, default=SCRIPT_ID_WORKER_ID, help="ID worker for generated IDs, distinct from every running app process")
+    args = parser.parse_args()
+    configure_id_generator(args.worker_id)
+
     cluster = None
     
     try:
@@ -0,0 +1,149 @@
+"""
+Script to correct drift in the message and conversation counter tables.
+Counters drift when a write is retried, when messages expire through their
+TTL, or when rows are written outside the API. Each conversation's messages
+are counted by paging through its partition (plus the archive), each user's
+conversations by scanning user_conversations and user_groups, and the
+difference is applied to the counter. Counters cannot be set directly, so
+increments that land during a run are not lost but may be briefly
+miscounted until the next run.
+"""
+import os
+import sys
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cassandra.cluster import Cluster
+from cassandra.query import SimpleStatement, dict_factory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.archive import MessageArchive, ARCHIVE_DIR, to_millis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cassandra connection settings
+CASSANDRA_HOST = os.getenv("CASSANDRA_HOST", "localhost")
+CASSANDRA_PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
+CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "messenger")
+
+# Reconciliation configuration
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", "8"))  # Conversations counted in parallel
+RECONCILE_FETCH_SIZE = int(os.getenv("RECONCILE_FETCH_SIZE", "1000"))  # Rows read per page
+
+def connect_to_cassandra():
+    """Connect to Cassandra cluster."""
+    logger.info("Connecting to Cassandra...")
+    try:
+        cluster = Cluster([CASSANDRA_HOST], port=CASSANDRA_PORT)
+        session = cluster.connect(CASSANDRA_KEYSPACE)
+        session.row_factory = dict_factory
+        logger.info("Connected to Cassandra!")
+        return cluster, session
+    except Exception as e:
+        logger.error(f"Failed to connect to Cassandra: {str(e)}")
+        raise
+
+def apply_delta(session, table, column, key_column, key, actual, dry_run):
+    """Move a counter to actual by adding the difference. Returns the difference."""
+    rows = list(session.execute(f"SELECT {column} FROM {table} WHERE {key_column} = %s", (key,)))
+    current = rows[0][column] if rows else 0
+    delta = actual - (current or 0)
+    if delta and not dry_run:
+        session.execute(f"UPDATE {table} SET {column} = {column} + %s WHERE {key_column} = %s", (delta, key))
+    return delta
+
+def count_messages(session, archive, conversation_id):
+    """Messages in the hot table plus those only in the archive."""
+    last_archived = archive.last_archived_at(conversation_id)
+    # A run can stop inside a millisecond, so rows at the newest archived timestamp
+    # are only counted here if the archive does not already hold them
+    already_archived = archive.archived_ids_at(conversation_id, to_millis(last_archived)) if last_archived else set()
+    query = "SELECT created_at, message_id FROM messages WHERE conversation_id = %(conversation_id)s"
+    params = {'conversation_id': conversation_id}
+    if last_archived is not None:
+        # Rows up to the newest archived block are counted from the archive index
+        query += " AND created_at >= %(last_archived)s"
+        params['last_archived'] = last_archived
+    statement = SimpleStatement(query, fetch_size=RECONCILE_FETCH_SIZE)
+    hot = sum(
+        1 for row in session.execute(statement, params)
+        if not (row['created_at'] == last_archived and str(row['message_id']) in already_archived)
+    )
+    return hot + archive.message_count(conversation_id)
+
+def reconcile_conversation(session, archive, conversation_id, dry_run):
+    actual = count_messages(session, archive, conversation_id)
+    return apply_delta(session, 'conversation_message_counts', 'message_count', 'conversation_id', conversation_id, actual, dry_run)
+
+def reconcile_message_counts(session, archive, workers, dry_run):
+    """Fix the message count of every conversation."""
+    conversation_ids = [row['conversation_id'] for row in session.execute("SELECT conversation_id FROM conversations")]
+    logger.info(f"Counting messages in {len(conversation_ids)} conversations with {workers} workers...")
+    corrected = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(reconcile_conversation, session, archive, cid, dry_run): cid
+            for cid in conversation_ids
+        }
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                delta = future.result()
+                if delta:
+                    corrected += 1
+                    logger.info(f"Conversation {cid}: message count off by {delta:+d}")
+            except Exception as e:
+                logger.error(f"Failed to reconcile conversation {cid}: {str(e)}")
+    logger.info(f"Corrected {corrected} of {len(conversation_ids)} conversation message counts")
+
+def reconcile_conversation_counts(session, dry_run):
+    """Fix the conversation count of every user."""
+    conversations = defaultdict(set)
+    for table in ('user_conversations', 'user_groups'):
+        statement = SimpleStatement(f"SELECT user_id, conversation_id FROM {table}", fetch_size=RECONCILE_FETCH_SIZE)
+        for row in session.execute(statement):
+            conversations[row['user_id']].add(row['conversation_id'])
+    # Users with a counter but no conversations left must go back to zero
+    statement = SimpleStatement("SELECT user_id FROM user_conversation_counts", fetch_size=RECONCILE_FETCH_SIZE)
+    user_ids = set(conversations) | {row['user_id'] for row in session.execute(statement)}
+    logger.info(f"Counting conversations of {len(user_ids)} users...")
+    corrected = 0
+    for user_id in user_ids:
+        try:
+            delta = apply_delta(
+                session, 'user_conversation_counts', 'conversation_count', 'user_id',
+                user_id, len(conversations.get(user_id, ())), dry_run
+            )
+            if delta:
+                corrected += 1
+                logger.info(f"User {user_id}: conversation count off by {delta:+d}")
+        except Exception as e:
+            logger.error(f"Failed to reconcile user {user_id}: {str(e)}")
+    logger.info(f"Corrected {corrected} of {len(user_ids)} user conversation counts")
+
+def main():
+    """Main function to reconcile the counter tables."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=RECONCILE_WORKERS, help="Conversations counted in parallel")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Directory holding the archive segment files")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without correcting it")
+    args = parser.parse_args()
+
+    cluster = None
+
+    try:
+        cluster, session = connect_to_cassandra()
+        reconcile_message_counts(session, MessageArchive(args.archive_dir), args.workers, args.dry_run)
+        reconcile_conversation_counts(session, args.dry_run)
+        logger.info("Counter reconciliation completed successfully!")
+    except Exception as e:
+        logger.error(f"Error during counter reconciliation: {str(e)}")
+    finally:
+        if cluster:
+            cluster.shutdown()
+            logger.info("Cassandra connection closed")
+
+if __name__ == "__main__":
+    main()
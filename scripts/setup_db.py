@@ -44,6 +44,21 @@ def create_keyspace(session):
     ''')
     logger.info(f"Keyspace {CASSANDRA_KEYSPACE} is ready.")
 
+def add_columns(session, table, columns):
+    """
+    Add columns to an existing table, skipping those that already exist.
+    """
+    existing = {
+        row.column_name for row in session.execute(
+            "SELECT column_name FROM system_schema.columns WHERE keyspace_name = %s AND table_name = %s",
+            (CASSANDRA_KEYSPACE, table)
+        )
+    }
+    for name, cql_type in columns.items():
+        if name not in existing:
+            logger.info(f"Adding column {table}.{name}...")
+            session.execute(f"ALTER TABLE {table} ADD {name} {cql_type}")
+
 def create_tables(session):
     """
     Create the tables for the application.
@@ -57,7 +72,12 @@ def create_tables(session):
             user1_id bigint,
             user2_id bigint,
             last_message_at timestamp,
-            last_message_content text
+            last_message_content text,
+            retention_seconds int,
+            is_group boolean,
+            name text,
+            fanout_mode text,
+            participant_count int
         )
     ''')
 
@@ -69,6 +89,8 @@ def create_tables(session):
             other_user_id bigint,
             last_message_at timestamp,
             last_message_content text,
+            is_group boolean,
+            name text,
             PRIMARY KEY (user_id, last_message_at, conversation_id)
         ) WITH CLUSTERING ORDER BY (last_message_at DESC, conversation_id ASC)
     ''')
@@ -82,10 +104,93 @@ def create_tables(session):
             sender_id bigint,
             receiver_id bigint,
             content text,
+            content_encoding text,
+            content_blob blob,
             PRIMARY KEY ((conversation_id), created_at, message_id)
         ) WITH CLUSTERING ORDER BY (created_at DESC, message_id ASC)
     ''')
 
+    # Columns added after the initial schema, for existing deployments
+    add_columns(session, 'messages', {'content_encoding': 'text', 'content_blob': 'blob', 'attachment_id': 'text'})
+    add_columns(session, 'conversations', {
+        'retention_seconds': 'int',
+        'is_group': 'boolean',
+        'name': 'text',
+        'fanout_mode': 'text',
+        'participant_count': 'int'
+    })
+    add_columns(session, 'user_conversations', {'is_group': 'boolean', 'name': 'text'})
+
+    # Members of group conversations
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS conversation_participants (
+            conversation_id bigint,
+            user_id bigint,
+            joined_at timestamp,
+            PRIMARY KEY ((conversation_id), user_id)
+        )
+    ''')
+
+    # Group memberships per user, with the group's fan-out mode for inbox reads
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS user_groups (
+            user_id bigint,
+            conversation_id bigint,
+            fanout_mode text,
+            joined_at timestamp,
+            PRIMARY KEY ((user_id), conversation_id)
+        )
+    ''')
+
+    # Inverted index for message search: token -> message keys, per conversation and per user
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS message_search_index (
+            scope text,
+            scope_id bigint,
+            token text,
+            created_at timestamp,
+            conversation_id bigint,
+            message_id uuid,
+            PRIMARY KEY ((scope, scope_id, token), created_at, conversation_id, message_id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, conversation_id ASC, message_id ASC)
+    ''')
+
+    # Read watermark per user in each conversation
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS read_receipts (
+            conversation_id bigint,
+            user_id bigint,
+            last_read_at timestamp,
+            last_read_message_id uuid,
+            updated_at timestamp,
+            PRIMARY KEY ((conversation_id), user_id)
+        )
+    ''')
+
+    # Attachment metadata, keyed by the SHA-256 blob ID in the blob store
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS attachments (
+            blob_id text PRIMARY KEY,
+            size bigint,
+            content_type text,
+            created_at timestamp
+        )
+    ''')
+
+    # Counters backing the totals of paginated message and conversation lists
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS conversation_message_counts (
+            conversation_id bigint PRIMARY KEY,
+            message_count counter
+        )
+    ''')
+    session.execute(f'''
+        CREATE TABLE IF NOT EXISTS user_conversation_counts (
+            user_id bigint PRIMARY KEY,
+            conversation_count counter
+        )
+    ''')
+
     logger.info("Tables created successfully.")
 
 def main():
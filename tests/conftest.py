@@ -0,0 +1,60 @@
+"""
+Shared test setup.
+
+The Cassandra driver's Cluster is replaced before the app is imported, so
+model queries are answered by a per-test handler instead of a live cluster.
+"""
+import os
+import re
+import tempfile
+
+import pytest
+import cassandra.cluster
+
+os.environ.setdefault("ID_WORKER_ID", "1")
+os.environ.setdefault("ID_LOCK_DIR", tempfile.mkdtemp(prefix="messenger-test-ids-"))
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+(\w+)', re.IGNORECASE)
+
+class FakeSession:
+    """Records executed queries and answers them with handler(table, query, params)."""
+
+    def __init__(self):
+        self.row_factory = None
+        self.handler = None
+        self.queries = []
+
+    def execute(self, statement, params=None, **kwargs):
+        query = getattr(statement, "query_string", statement)
+        match = _TABLE.search(query)
+        table = match.group(1) if match else None
+        self.queries.append((table, query, params))
+        if self.handler is None:
+            return []
+        return self.handler(table, query, params or {})
+
+    def tables(self):
+        return [table for table, _, _ in self.queries]
+
+class FakeCluster:
+    session = FakeSession()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def connect(self, keyspace=None):
+        return FakeCluster.session
+
+    def shutdown(self):
+        pass
+
+cassandra.cluster.Cluster = FakeCluster
+
+@pytest.fixture
+def cassandra_session():
+    """The fake session behind cassandra_client, reset for each test."""
+    session = FakeCluster.session
+    session.handler = None
+    session.queries = []
+    yield session
+    session.handler = None
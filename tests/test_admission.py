@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.admission import AdaptiveLimiter, AdmissionController, AdmissionRejected, admission_controller
+
+def _limiter(**kwargs):
+    settings = dict(initial_limit=1, min_limit=1, max_limit=4, max_queue=2, queue_timeout=1.0, target_latency_ms=50)
+    settings.update(kwargs)
+    return AdaptiveLimiter('test', **settings)
+
+def test_queued_request_is_admitted_when_a_slot_is_released():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.snapshot()['queued'] == 1
+        limiter.release(0.001)
+        await asyncio.wait_for(waiter, 1)
+        assert limiter.snapshot()['in_flight'] == 1
+        assert limiter.admitted == 2
+
+    asyncio.run(scenario())
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        limiter = _limiter(max_queue=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.status_code == 503
+        assert int(rejected.value.headers['Retry-After']) >= 1
+        assert limiter.rejected == 1
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+def test_queue_timeout_rejects_and_leaves_the_queue():
+    async def scenario():
+        limiter = _limiter(queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire()
+        assert limiter.timed_out == 1
+        assert limiter.snapshot()['queued'] == 0
+        assert limiter.snapshot()['in_flight'] == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_frees_its_queue_slot():
+    async def scenario():
+        limiter = _limiter(max_queue=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.snapshot()['queued'] == 0
+        # The freed queue spot can be taken and is admitted on release
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(0.001)
+        await asyncio.wait_for(second, 1)
+        assert limiter.snapshot()['in_flight'] == 1
+
+    asyncio.run(scenario())
+
+def test_waiter_cancelled_after_handover_returns_its_slot():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # Hand the slot over, then cancel before the waiter gets to run
+        limiter.release(0.001)
+        waiter.cancel()
+        try:
+            await waiter
+            holders = 1
+        except asyncio.CancelledError:
+            holders = 0
+        # Either the waiter kept the slot it was given or it gave it back; none leaks
+        assert limiter.snapshot()['in_flight'] == holders
+
+    asyncio.run(scenario())
+
+def test_limit_grows_on_fast_completions_and_shrinks_on_congestion():
+    async def scenario():
+        limiter = _limiter(initial_limit=2)
+        for _ in range(8):
+            await limiter.acquire()
+            limiter.release(0.001)
+        assert limiter.limit > 2
+        grown = limiter._limit
+        await limiter.acquire()
+        limiter.release(0.001, congested=True)
+        assert limiter._limit == pytest.approx(grown * limiter.decrease_factor)
+        # A second signal inside the same target-latency window does not shrink it again
+        await limiter.acquire()
+        limiter.release(1.0)
+        assert limiter._limit == pytest.approx(grown * limiter.decrease_factor)
+        assert limiter.congestion_signals == 2
+
+    asyncio.run(scenario())
+
+def test_disabled_controller_admits_without_a_limiter():
+    async def scenario():
+        controller = AdmissionController(enabled=False)
+        async with controller.admit('message_read'):
+            pass
+        assert controller.snapshot()['classes'] == {}
+
+    asyncio.run(scenario())
+
+def test_saturated_query_class_returns_503_from_the_controller(cassandra_session, monkeypatch):
+    limiter = _limiter(max_queue=0)
+    limiter._in_flight = limiter.limit
+    monkeypatch.setitem(admission_controller._limiters, 'search_read', limiter)
+
+    response = TestClient(app).get("/api/messages/conversation/7/search", params={'q': 'hello'})
+    assert response.status_code == 503, response.text
+    assert int(response.headers['Retry-After']) >= 1
+    assert limiter.rejected == 1
+    assert 'message_search_index' not in cassandra_session.tables()
@@ -0,0 +1,138 @@
+import importlib.util
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.archive import MessageArchive, to_millis
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+def _load_script(name):
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _message(created_at, content):
+    return {
+        'created_at': created_at,
+        'message_id': uuid.uuid4(),
+        'sender_id': 1,
+        'receiver_id': 2,
+        'content': content,
+        'content_encoding': None,
+        'content_blob': None,
+        'attachment_id': None,
+        'ttl': None
+    }
+
+class ArchiveSession:
+    """Answers the archiver's messages queries from a list of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def prepare(self, query):
+        return query
+
+    def execute(self, statement, params):
+        query = getattr(statement, "query_string", statement)
+        if query.startswith("DELETE"):
+            self.rows = [row for row in self.rows if row['created_at'] >= params['cutoff']]
+            return []
+        rows = [row for row in self.rows if 'cutoff' not in params or row['created_at'] < params['cutoff']]
+        if "created_at >= %(last_archived)s" in query:
+            rows = [row for row in rows if row['created_at'] >= params['last_archived']]
+        elif "created_at > %(last_archived)s" in query:
+            rows = [row for row in rows if row['created_at'] > params['last_archived']]
+        return [dict(row) for row in sorted(rows, key=lambda row: row['created_at'])]
+
+def test_round_trip_reads_newest_first_before_a_timestamp(tmp_path):
+    archive = MessageArchive(str(tmp_path))
+    messages = [_message(NOW + timedelta(seconds=i), f"m{i}") for i in range(10)]
+    archive.append_block(5, messages[:4])
+    archive.append_block(5, messages[4:])
+    rows = archive.read_before(5, NOW + timedelta(seconds=7), limit=5)
+    assert [row['content'] for row in rows] == ["m6", "m5", "m4", "m3", "m2"]
+    assert rows[0]['created_at'] == NOW + timedelta(seconds=6)
+    assert archive.message_count(5) == 10
+    assert archive.last_archived_at(5) == NOW + timedelta(seconds=9)
+
+def test_resume_archives_the_rest_of_a_split_millisecond(tmp_path):
+    archiver = _load_script("archive_messages")
+    archive = MessageArchive(str(tmp_path))
+    # Three rows share a millisecond; an interrupted run archived only the first block
+    same_ms = [_message(NOW, f"tie{i}") for i in range(3)]
+    later = [_message(NOW + timedelta(seconds=1), "later")]
+    archive.append_block(5, [same_ms[0]])
+    assert archive.archived_ids_at(5, to_millis(NOW)) == {str(same_ms[0]['message_id'])}
+
+    session = ArchiveSession(same_ms + later)
+    archiver.execute_concurrent_with_args = lambda session, statement, keys, concurrency: None
+    cutoff = NOW + timedelta(days=1)
+    archived = archiver.archive_conversation(session, archive, 5, cutoff, block_size=2, delete=True)
+
+    assert archived == 3
+    assert archive.message_count(5) == 4
+    contents = [row['content'] for row in archive.read_before(5, cutoff, limit=10)]
+    assert sorted(contents) == ["later", "tie0", "tie1", "tie2"]
+    assert session.rows == []
+
+def test_expired_archived_messages_are_hidden_and_purged(tmp_path):
+    # One block per segment, so each block can be purged on its own
+    archive = MessageArchive(str(tmp_path), segment_max_bytes=1)
+    now = datetime.utcnow()
+    expired = [dict(_message(NOW + timedelta(seconds=i), f"expired{i}"), expires_at=now - timedelta(hours=1)) for i in range(2)]
+    expiring = [dict(_message(NOW + timedelta(seconds=10 + i), f"expiring{i}"), expires_at=now + timedelta(hours=1)) for i in range(2)]
+    kept = [_message(NOW + timedelta(seconds=20 + i), f"kept{i}") for i in range(2)]
+    for block in (expired, expiring, kept):
+        archive.append_block(5, block)
+
+    contents = [row['content'] for row in archive.read_before(5, now, limit=10)]
+    assert contents == ["kept1", "kept0", "expiring1", "expiring0"]
+    assert archive.purge_expired(5) == 2
+    assert archive.message_count(5) == 4
+    assert archive.purge_expired(5, now=now + timedelta(hours=2)) == 2
+    assert [row['content'] for row in archive.read_before(5, now, limit=10)] == ["kept1", "kept0"]
+
+def test_archiver_keeps_expiry_and_removes_search_postings(tmp_path):
+    archiver = _load_script("archive_messages")
+    deleted = []
+    archiver.execute_concurrent_with_args = lambda session, statement, keys, concurrency: deleted.extend(keys)
+    archive = MessageArchive(str(tmp_path))
+    expiring = dict(_message(NOW, "hello world"), ttl=3600)
+    forever = _message(NOW + timedelta(seconds=1), "goodbye")
+    session = ArchiveSession([expiring, forever])
+
+    archiver.archive_conversation(session, archive, 5, NOW + timedelta(days=1), block_size=10, delete=True)
+
+    entry, = archive.load_index(5)
+    assert entry.expires_ms == 0
+    stored = {row['content']: row['expires_at'] for row in archive._read_block(5, entry)}
+    assert stored['goodbye'] is None
+    assert stored['hello world'] > to_millis(datetime.utcnow())
+    # Two tokens in three scopes, and one token in three scopes
+    assert len(deleted) == 9
+    assert ('conversation', 5, 'hello', NOW, 5, expiring['message_id']) in deleted
+    assert {key[:2] for key in deleted} == {('conversation', 5), ('user', 1), ('user', 2)}
+    assert session.rows == []
+
+def test_reconcile_counts_unarchived_rows_of_a_split_millisecond(tmp_path):
+    reconciler = _load_script("reconcile_counts")
+    archive = MessageArchive(str(tmp_path))
+    same_ms = [_message(NOW, f"tie{i}") for i in range(3)]
+    archive.append_block(5, [same_ms[0]])
+    session = ArchiveSession(same_ms + [_message(NOW + timedelta(seconds=1), "later")])
+    assert reconciler.count_messages(session, archive, 5) == 4
+
+def test_retention_cache_is_bounded(monkeypatch):
+    from app.models import cassandra_models
+    from app.models.cassandra_models import ConversationModel
+
+    monkeypatch.setattr(cassandra_models, "RETENTION_CACHE_MAX_ENTRIES", 100)
+    monkeypatch.setattr(ConversationModel, "_retention_cache", {})
+    for conversation_id in range(1000):
+        ConversationModel._cache_retention(conversation_id, 60)
+    assert len(ConversationModel._retention_cache) <= 100
+    assert 999 in ConversationModel._retention_cache
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.blobstore import blob_store
+
+@pytest.fixture
+def blob_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "root", str(tmp_path))
+    return tmp_path
+
+def _stored_blobs(root):
+    return [name for _, dirs, files in os.walk(root) for name in files if len(name) == 64]
+
+def test_empty_upload_is_rejected_before_it_is_stored(cassandra_session, blob_root):
+    response = TestClient(app).post("/api/attachments/", content=b"", headers={'Content-Type': 'text/plain'})
+    assert response.status_code == 400, response.text
+    assert _stored_blobs(blob_root) == []
+    assert os.listdir(blob_root / "tmp") == []
+    assert 'attachments' not in cassandra_session.tables()
+
+def test_identical_uploads_are_stored_once_and_served_with_ranges(cassandra_session, blob_root):
+    metadata = {}
+
+    def handler(table, query, params):
+        if table == 'attachments' and query.lstrip().startswith("INSERT"):
+            metadata[params['blob_id']] = dict(params)
+        elif table == 'attachments':
+            row = metadata.get(params['blob_id'])
+            return [row] if row else []
+        return []
+
+    cassandra_session.handler = handler
+    client = TestClient(app)
+    data = bytes(range(256)) * 64
+    first = client.post("/api/attachments/", content=data, headers={'Content-Type': 'image/png'})
+    second = client.post("/api/attachments/", content=data, headers={'Content-Type': 'image/png'})
+    assert first.status_code == second.status_code == 201
+    assert first.json()['id'] == second.json()['id']
+    assert second.json()['deduplicated'] is True
+    assert len(_stored_blobs(blob_root)) == 1
+
+    partial = client.get(f"/api/attachments/{first.json()['id']}", headers={'Range': 'bytes=100-199'})
+    assert partial.status_code == 206
+    assert partial.content == data[100:200]
+    assert partial.headers['content-type'] == 'image/png'
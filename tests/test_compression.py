@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import compression
+from app.core.compression import encode_content, decode_content, preview
+
+LONG = "The quick brown fox jumps over the lazy dog. " * 100
+
+def test_large_content_round_trips_through_the_blob():
+    content, encoding, blob = encode_content(LONG, codec='zlib', threshold=1024)
+    assert content is None and encoding == 'zlib'
+    assert len(blob) < len(LONG.encode('utf-8'))
+    assert decode_content({'content': content, 'content_encoding': encoding, 'content_blob': blob}) == LONG
+
+def test_small_or_incompressible_content_stays_plain():
+    assert encode_content("hello", codec='zlib', threshold=1024) == ("hello", None, None)
+    # Compressing two bytes only adds framing, so the plain text is kept
+    assert encode_content("ab", codec='zlib', threshold=0) == ("ab", None, None)
+    assert decode_content({'content': "hello", 'content_encoding': None, 'content_blob': None}) == "hello"
+
+def test_configured_codec_falls_back_when_unavailable(monkeypatch):
+    monkeypatch.setattr(compression, "zstandard", None)
+    monkeypatch.setattr(compression, "MESSAGE_COMPRESSION_CODEC", "zstd")
+    assert encode_content(LONG, threshold=0)[1] == 'zlib'
+    monkeypatch.setattr(compression, "MESSAGE_COMPRESSION_CODEC", "none")
+    assert encode_content(LONG, threshold=0) == (LONG, None, None)
+    with pytest.raises(ValueError):
+        compression.compress(b"data", 'zstd')
+
+def test_preview_truncates_long_content():
+    assert preview("short") == "short"
+    truncated = preview(LONG, max_length=20)
+    assert len(truncated) == 20 and truncated.endswith('…')
+
+def test_sent_messages_store_large_content_compressed(cassandra_session):
+    response = TestClient(app).post("/api/messages/", json={'sender_id': 1, 'receiver_id': 2, 'content': LONG})
+    assert response.status_code == 201, response.text
+    assert response.json()['content'] == LONG
+    (params,) = [params for table, query, params in cassandra_session.queries if "INSERT INTO messages" in query]
+    assert params['content'] is None and params['content_encoding'] is not None
+    assert decode_content(params) == LONG
+    (last,) = {params['last_message_content'] for table, query, params in cassandra_session.queries if "INTO user_conversations" in query}
+    assert len(last) == compression.PREVIEW_MAX_LENGTH
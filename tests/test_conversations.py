@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.archive import to_millis
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+class Inbox:
+    """user_conversations and conversations rows, updated from the statements the models execute."""
+
+    def __init__(self, groups):
+        self.rows = {}
+        self.groups = groups
+
+    def handle(self, table, query, params):
+        if "DELETE FROM user_conversations" in query:
+            self.rows.pop((params['user_id'], to_millis(params['previous_message_at']), params['conversation_id']), None)
+        if "INSERT INTO user_conversations" in query:
+            key = (params['user_id'], to_millis(params['last_message_at']), params['conversation_id'])
+            self.rows[key] = {
+                'conversation_id': params['conversation_id'],
+                'other_user_id': params.get('other_user_id'),
+                'last_message_at': params['last_message_at'],
+                'last_message_content': params['last_message_content'],
+                'is_group': 'is_group' in query,
+                'name': params.get('name')
+            }
+            return []
+        if table == 'conversations' and query.lstrip().startswith("UPDATE"):
+            group = self.groups.get(params['conversation_id'])
+            if group is not None:
+                group['last_message_at'] = params['last_message_at']
+            return []
+        if table == 'conversations' and 'conversation_id' in params:
+            group = self.groups.get(params['conversation_id'])
+            return [dict(group)] if group else []
+        if table == 'conversation_participants':
+            members = self.groups[params['conversation_id']]['members']
+            if 'user_id' in params:
+                return [{'user_id': params['user_id']}] if params['user_id'] in members else []
+            return [{'user_id': uid} for uid in members]
+        if table == 'user_conversations' and query.lstrip().startswith("SELECT"):
+            rows = sorted(
+                (row for (uid, _, _), row in self.rows.items() if uid == params['user_id']),
+                key=lambda row: row['last_message_at'],
+                reverse=True
+            )
+            return rows[:params['limit']]
+        return []
+
+def test_group_messages_move_inbox_rows_instead_of_adding_them(cassandra_session):
+    groups = {
+        cid: {
+            'conversation_id': cid, 'is_group': True, 'name': f"group {cid}", 'fanout_mode': 'write',
+            'last_message_at': NOW, 'members': [1, 2, 3]
+        }
+        for cid in (101, 102, 103)
+    }
+    inbox = Inbox(groups)
+    for cid in groups:
+        for uid in (1, 2, 3):
+            inbox.rows[(uid, to_millis(NOW), cid)] = {
+                'conversation_id': cid, 'other_user_id': None, 'last_message_at': NOW,
+                'last_message_content': '', 'is_group': True, 'name': f"group {cid}"
+            }
+    cassandra_session.handler = inbox.handle
+    client = TestClient(app)
+
+    for i in range(6):
+        cid = 101 + i % 3
+        response = client.post("/api/messages/", json={'sender_id': 1, 'conversation_id': cid, 'content': f"hello {i}"})
+        assert response.status_code == 201, response.text
+
+    assert len([key for key in inbox.rows if key[0] == 2]) == 3
+    first = client.get("/api/conversations/user/2", params={'page': 1, 'limit': 2}).json()
+    second = client.get("/api/conversations/user/2", params={'page': 2, 'limit': 2}).json()
+    assert [c['id'] for c in first['data']] == ['103', '102']
+    assert [c['id'] for c in second['data']] == ['101']
+
+def test_direct_messages_replace_the_previous_inbox_row(cassandra_session):
+    previous = NOW - timedelta(minutes=5)
+
+    def handler(table, query, params):
+        if table == 'conversations' and query.lstrip().startswith("SELECT"):
+            return [{'conversation_id': 55, 'last_message_at': previous}]
+        return []
+
+    cassandra_session.handler = handler
+    response = TestClient(app).post("/api/messages/", json={'sender_id': 1, 'receiver_id': 2, 'content': "hi"})
+    assert response.status_code == 201, response.text
+    upserts = [(query, params) for table, query, params in cassandra_session.queries if "INTO user_conversations" in query]
+    assert {params['user_id'] for _, params in upserts} == {1, 2}
+    for query, params in upserts:
+        assert "DELETE FROM user_conversations" in query
+        assert params['previous_message_at'] == previous
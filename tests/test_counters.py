@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import cassandra_models
+from app.models.cassandra_models import CounterModel
+
+def _counter_batches(session):
+    return [(query, params) for table, query, params in session.queries if "BEGIN COUNTER BATCH" in query]
+
+def test_first_message_counts_the_conversation_for_both_users(cassandra_session):
+    existing = []
+
+    def handler(table, query, params):
+        if table == 'conversations' and query.lstrip().startswith("SELECT"):
+            return existing
+        return []
+
+    cassandra_session.handler = handler
+    client = TestClient(app)
+    assert client.post("/api/messages/", json={'sender_id': 1, 'receiver_id': 2, 'content': "hi"}).status_code == 201
+    (query, params), = _counter_batches(cassandra_session)
+    assert query.count("conversation_message_counts") == 1
+    assert query.count("user_conversation_counts") == 2
+    assert {params['user_id_0'], params['user_id_1']} == {1, 2}
+
+    # The conversation exists now: only its message count moves
+    existing.append({'conversation_id': params['conversation_id'], 'last_message_at': datetime(2026, 1, 1)})
+    cassandra_session.queries = []
+    assert client.post("/api/messages/", json={'sender_id': 2, 'receiver_id': 1, 'content': "hello"}).status_code == 201
+    (query, params), = _counter_batches(cassandra_session)
+    assert "user_conversation_counts" not in query
+    assert params == {'conversation_id': existing[0]['conversation_id']}
+
+def test_group_members_are_counted_in_bounded_batches(cassandra_session, monkeypatch):
+    monkeypatch.setattr(cassandra_models, "COUNTER_BATCH_SIZE", 100)
+    asyncio.run(CounterModel.add_user_conversations(list(range(250))))
+    batches = _counter_batches(cassandra_session)
+    assert [query.count("UPDATE") for query, _ in batches] == [100, 100, 50]
+    assert sorted(uid for _, params in batches for uid in params.values()) == list(range(250))
+
+def test_page_totals_come_from_the_counter_tables(cassandra_session):
+    def handler(table, query, params):
+        if table == 'conversation_message_counts':
+            return [{'message_count': 42}]
+        if table == 'user_conversation_counts':
+            return [{'conversation_count': 17}]
+        if table == 'messages':
+            return [{
+                'conversation_id': 7, 'created_at': datetime(2026, 1, 1), 'message_id': uuid.uuid4(),
+                'sender_id': 1, 'receiver_id': 2, 'content': "hi", 'content_encoding': None, 'content_blob': None
+            }]
+        return []
+
+    cassandra_session.handler = handler
+    client = TestClient(app)
+    messages = client.get("/api/messages/conversation/7").json()
+    assert messages['total'] == 42 and len(messages['data']) == 1
+    conversations = client.get("/api/conversations/user/1").json()
+    assert conversations['total'] == 17
+    assert not any("COUNT(" in query.upper() for _, query, _ in cassandra_session.queries)
@@ -0,0 +1,63 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+def _messages(conversation_id, count, step_minutes):
+    return [
+        {
+            'conversation_id': conversation_id,
+            'created_at': NOW - timedelta(minutes=i * step_minutes),
+            'message_id': uuid.uuid4(),
+            'sender_id': 1,
+            'receiver_id': 2,
+            'content': f"message {i} in {conversation_id}",
+            'content_encoding': None,
+            'content_blob': None,
+            'attachment_id': None
+        }
+        for i in range(count)
+    ]
+
+def test_feed_pages_merge_conversations_newest_first(cassandra_session):
+    # Snowflake-sized IDs, above what a JavaScript number holds exactly
+    first, second = 370525532703428608, 370525532703428609
+    partitions = {first: _messages(first, 5, 2), second: _messages(second, 5, 3)}
+
+    def handler(table, query, params):
+        if table == 'user_conversations':
+            return [
+                {'conversation_id': cid, 'other_user_id': 2, 'last_message_at': rows[0]['created_at']}
+                for cid, rows in partitions.items()
+            ]
+        if table == 'messages':
+            rows = partitions[params['conversation_id']]
+            if params.get('up_to') is not None:
+                rows = [row for row in rows if row['created_at'] <= params['up_to']]
+            return [dict(row) for row in rows[:params['limit']]]
+        return []
+
+    cassandra_session.handler = handler
+    client = TestClient(app)
+
+    seen = []
+    cursor = None
+    while True:
+        response = client.get("/api/users/1/feed", params={'limit': 3, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        seen.extend(body['data'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == 10
+    assert len({message['id'] for message in seen}) == 10
+    times = [message['created_at'] for message in seen]
+    assert times == sorted(times, reverse=True)
+    assert isinstance(seen[0]['id'], str)
+    assert {message['conversation_id'] for message in seen} == {str(first), str(second)}
@@ -0,0 +1,32 @@
+from app.core.hotkeys import SpaceSaving, HotPartitionTracker
+
+def test_space_saving_is_exact_below_capacity():
+    summary = SpaceSaving(capacity=3)
+    for key in 'aababc':
+        summary.offer(key)
+    assert summary.top(3) == [('a', 3, 0), ('b', 2, 0), ('c', 1, 0)]
+
+def test_space_saving_keeps_heavy_hitters_and_bounds_errors():
+    summary = SpaceSaving(capacity=4)
+    for i in range(1000):
+        summary.offer('hot')
+        summary.offer(f'cold-{i}')
+    assert len(summary.counts) == 4
+    key, count, error = summary.top(1)[0]
+    assert key == 'hot'
+    assert count - error <= 1000 <= count
+    for key, count, error in summary.top(4):
+        # No estimate may exceed the true count by more than N / capacity
+        assert error <= summary.total / summary.capacity
+
+def test_tracker_alerts_on_guaranteed_count_only(caplog):
+    tracker = HotPartitionTracker(window=60, capacity=2, alert_rate=1 / 6)
+    # Alert threshold is 10 guaranteed hits in the window; churn alone must not reach it
+    for i in range(50):
+        tracker.record('messages', 'read', f'churn-{i}')
+    assert 'Hot partition' not in caplog.text
+    for _ in range(10):
+        tracker.record('messages', 'write', 42)
+    assert caplog.text.count('Hot partition') == 1
+    top = tracker.snapshot()['current']['tables']['messages']['write']['top']
+    assert top[0]['key'] == 42 and top[0]['count'] == 10
@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.ids import IdGenerator, claim_worker_id, WorkerIdInUse, MAX_SEQUENCE
+
+def test_bulk_ids_are_unique_and_increasing():
+    generator = IdGenerator(worker_id=5)
+    ids = generator.next_ids(3 * (MAX_SEQUENCE + 1))
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    # Single IDs continue after the bulk ones
+    assert generator.next_id() > ids[-1]
+
+def test_ids_from_different_workers_never_collide():
+    a, b = IdGenerator(worker_id=1), IdGenerator(worker_id=2)
+    assert not set(a.next_ids(10000)) & set(b.next_ids(10000))
+
+def test_timeuuid_is_version_1_and_time_ordered():
+    generator = IdGenerator(worker_id=3)
+    first, second = generator.next_timeuuid(), generator.next_timeuuid()
+    assert first.version == 1
+    assert (first.time, first.int) < (second.time, second.int)
+
+def test_second_claim_of_a_worker_id_fails(tmp_path):
+    claim = claim_worker_id(17, lock_dir=str(tmp_path))
+    try:
+        with pytest.raises(WorkerIdInUse):
+            claim_worker_id(17, lock_dir=str(tmp_path))
+        claim_worker_id(18, lock_dir=str(tmp_path)).close()
+    finally:
+        claim.close()
+    claim_worker_id(17, lock_dir=str(tmp_path)).close()
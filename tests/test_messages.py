@@ -0,0 +1,135 @@
+import os
+import time
+import uuid
+import asyncio
+import importlib.util
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import cassandra_models
+from app.models.cassandra_models import SearchIndexModel
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+def test_search_returns_matching_messages_with_consistent_total(cassandra_session):
+    message_ids = [uuid.uuid4() for _ in range(3)]
+
+    def handler(table, query, params):
+        if table == 'message_search_index':
+            return [
+                {'created_at': NOW, 'conversation_id': 7, 'message_id': message_id}
+                for message_id in message_ids
+            ]
+        if table == 'messages':
+            return [{
+                'conversation_id': 7,
+                'created_at': NOW,
+                'message_id': params['message_id'],
+                'sender_id': 1,
+                'receiver_id': 2,
+                'content': 'hello search',
+                'content_encoding': None,
+                'content_blob': None
+            }]
+        return []
+
+    cassandra_session.handler = handler
+    response = TestClient(app).get("/api/messages/conversation/7/search", params={'q': 'hello'})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [message['id'] for message in body['data']] == [str(m) for m in message_ids]
+    assert body['total'] == len(body['data']) == 3
+
+def test_send_succeeds_when_search_indexing_fails(cassandra_session, monkeypatch):
+    monkeypatch.setattr(cassandra_models, "SEARCH_INDEX_MAX_ATTEMPTS", 1)
+
+    def handler(table, query, params):
+        if table == 'message_search_index':
+            raise RuntimeError("index unavailable")
+        return []
+
+    cassandra_session.handler = handler
+    failures = SearchIndexModel.index_failures
+    response = TestClient(app).post("/api/messages/", json={'sender_id': 1, 'receiver_id': 2, 'content': 'hello there world'})
+    assert response.status_code == 201, response.text
+    tables = cassandra_session.tables()
+    assert 'messages' in tables and 'conversation_message_counts' in tables
+    # Indexing runs in the background, as one batch per scope (conversation, sender, receiver)
+    deadline = time.monotonic() + 2
+    while SearchIndexModel.index_failures == failures and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert SearchIndexModel.index_failures == failures + 1
+    assert cassandra_session.tables().count('message_search_index') == 3
+
+def _schedule(conversation_id):
+    return SearchIndexModel.schedule_index(conversation_id, 1, 2, "hello there", NOW, uuid.uuid4())
+
+def test_indexing_retries_transient_failures(cassandra_session, monkeypatch):
+    monkeypatch.setattr(cassandra_models, "SEARCH_INDEX_RETRY_DELAY", 0)
+    attempts = []
+
+    def handler(table, query, params):
+        if table == 'message_search_index':
+            attempts.append(params['scope'])
+            if len(attempts) <= 3:
+                raise RuntimeError("overloaded")
+        return []
+
+    cassandra_session.handler = handler
+    before = SearchIndexModel.snapshot()
+
+    async def run():
+        await _schedule(8)
+
+    asyncio.run(run())
+    after = SearchIndexModel.snapshot()
+    assert after['indexed'] == before['indexed'] + 1
+    assert after['retries'] == before['retries'] + 1
+    assert after['failures'] == before['failures']
+    assert len(attempts) == 6
+
+def test_failed_and_skipped_indexing_is_reported_for_repair(cassandra_session, monkeypatch):
+    monkeypatch.setattr(cassandra_models, "SEARCH_INDEX_RETRY_DELAY", 0)
+    monkeypatch.setattr(cassandra_models, "SEARCH_INDEX_MAX_PENDING", 1)
+
+    def handler(table, query, params):
+        if table == 'message_search_index':
+            raise RuntimeError("index unavailable")
+        return []
+
+    cassandra_session.handler = handler
+    before = SearchIndexModel.snapshot()
+
+    async def run():
+        task = _schedule(9)
+        # The backlog holds one task, so the next message is skipped rather than queued
+        assert _schedule(10) is None
+        with pytest.raises(RuntimeError):
+            await task
+
+    asyncio.run(run())
+    state = TestClient(app).get("/api/admin/search-index").json()
+    assert state['failures'] == before['failures'] + 1
+    assert state['dropped'] == before['dropped'] + 1
+    assert state['retries'] == before['retries'] + cassandra_models.SEARCH_INDEX_MAX_ATTEMPTS - 1
+    assert set(state['failed_conversations'][-2:]) == {9, 10}
+
+def test_backfilled_postings_expire_with_their_message():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "backfill_search_index.py")
+    spec = importlib.util.spec_from_file_location("backfill_search_index", path)
+    backfill = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backfill)
+
+    Row = namedtuple('Row', 'conversation_id created_at message_id sender_id receiver_id content content_encoding content_blob ttl')
+    expiring = Row(7, NOW, uuid.uuid4(), 1, 2, 'hello world', None, None, 3600)
+    kept = expiring._replace(ttl=None)
+    tokenizer = backfill.get_tokenizer()
+
+    postings = backfill.postings_for_message(expiring, tokenizer)
+    assert postings and {posting[-1] for posting in postings} == {3600}
+    assert all(len(posting) == backfill.INSERT_POSTING.count('?') for posting in postings)
+    assert {posting[-1] for posting in backfill.postings_for_message(kept, tokenizer)} == {0}
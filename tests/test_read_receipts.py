@@ -0,0 +1,109 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.watermarks import WatermarkBuffer
+from app.models.cassandra_models import ReadReceiptModel, read_receipt_buffer
+
+def test_buffer_keeps_only_the_highest_mark_per_key():
+    written = []
+
+    async def flush(batch):
+        written.append(dict(batch))
+
+    async def run():
+        buffer = WatermarkBuffer(flush, interval=3600)
+        for i in range(100):
+            buffer.update((1, 7), (i, f"m{i}"))
+        assert not buffer.update((1, 7), (50, "old"))
+        buffer.update((2, 7), (3, "x"))
+        assert buffer.pending_in(1) == {(1, 7): (99, "m99")}
+        await buffer.flush()
+        # Behind the flushed mark: dropped without a write
+        assert not buffer.update((1, 7), (10, "older"))
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert written == [{(1, 7): (99, "m99"), (2, 7): (3, "x")}]
+    assert buffer.snapshot()['rows_written'] == 2
+
+def test_failed_flush_is_retried_without_losing_newer_marks():
+    attempts = []
+
+    async def flush(batch):
+        attempts.append(dict(batch))
+        if len(attempts) == 1:
+            raise RuntimeError("cassandra down")
+
+    async def run():
+        buffer = WatermarkBuffer(flush, interval=3600)
+        buffer.update((1, 7), (5, "a"))
+        await buffer.flush()
+        buffer.update((1, 7), (3, "stale"))
+        await buffer.flush()
+
+    asyncio.run(run())
+    assert attempts[-1] == {(1, 7): (5, "a")}
+
+def test_watermarks_are_written_with_their_own_timestamp(cassandra_session):
+    read_at = datetime(2026, 1, 1, 12, 0, 0, 123000)
+    asyncio.run(ReadReceiptModel.save_watermarks({(1, 7): (read_at, uuid.uuid4())}))
+    (_, query, params), = cassandra_session.queries
+    assert "USING TIMESTAMP" in query
+    assert params['write_timestamp'] == 1767268800123000
+
+def _messages_handler(*stored):
+    """Answer get_message lookups for the given (conversation_id, created_at, message_id) rows."""
+    keys = set(stored)
+
+    def handler(table, query, params):
+        if table == 'messages' and (params['conversation_id'], params['created_at'], params['message_id']) in keys:
+            return [{
+                'conversation_id': params['conversation_id'],
+                'created_at': params['created_at'],
+                'message_id': params['message_id'],
+                'sender_id': 1,
+                'receiver_id': 2,
+                'content': 'hi',
+                'content_encoding': None,
+                'content_blob': None
+            }]
+        return []
+    return handler
+
+def test_mark_read_behind_current_reports_the_standing_watermark(cassandra_session):
+    ahead, behind_id = uuid.uuid4(), uuid.uuid4()
+    cassandra_session.handler = _messages_handler(
+        (41, datetime(2026, 1, 1, 12, 0, 5), ahead),
+        (41, datetime(2026, 1, 1, 12, 0, 1), behind_id)
+    )
+    client = TestClient(app)
+    first = client.post("/api/messages/conversation/41/read", json={
+        'user_id': 9, 'message_id': str(ahead), 'created_at': '2026-01-01T12:00:05+00:00'
+    })
+    assert first.status_code == 202, first.text
+    behind = client.post("/api/messages/conversation/41/read", json={
+        'user_id': 9, 'message_id': str(behind_id), 'created_at': '2026-01-01T12:00:01Z'
+    })
+    assert behind.status_code == 202, behind.text
+    assert behind.json()['last_read_message_id'] == str(ahead)
+    assert behind.json()['last_read_at'].startswith('2026-01-01T12:00:05')
+    assert read_receipt_buffer.current((41, 9))[0] == datetime(2026, 1, 1, 12, 0, 5)
+
+def test_mark_read_rejects_unknown_messages_and_future_timestamps(cassandra_session):
+    cassandra_session.handler = _messages_handler()
+    client = TestClient(app)
+    future = client.post("/api/messages/conversation/42/read", json={
+        'user_id': 9, 'message_id': str(uuid.uuid4()), 'created_at': '2199-01-01T00:00:00Z'
+    })
+    assert future.status_code == 400, future.text
+    assert 'messages' not in cassandra_session.tables()
+    unknown = client.post("/api/messages/conversation/42/read", json={
+        'user_id': 9, 'message_id': str(uuid.uuid4()), 'created_at': '2026-01-01T12:00:00Z'
+    })
+    assert unknown.status_code == 404, unknown.text
+    assert read_receipt_buffer.current((42, 9)) is None
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight('test')
+        runs = []
+
+        async def fetch():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return 'row'
+
+        results = await asyncio.gather(*(flight.do('key', fetch) for _ in range(5)))
+        assert results == ['row'] * 5
+        assert len(runs) == 1
+        assert flight.snapshot()['coalesced'] == 4
+        assert flight.snapshot()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+def test_failed_flight_is_forgotten_and_retried():
+    async def scenario():
+        flight = SingleFlight('test')
+        attempts = []
+
+        async def fetch():
+            attempts.append(1)
+            await asyncio.sleep(0)
+            if len(attempts) == 1:
+                raise RuntimeError("timeout")
+            return 'row'
+
+        with pytest.raises(RuntimeError):
+            await asyncio.gather(flight.do('key', fetch), flight.do('key', fetch))
+        await asyncio.sleep(0)
+        assert flight.snapshot()['in_flight'] == 0
+        assert flight.errors == 1
+        assert await flight.do('key', fetch) == 'row'
+
+    asyncio.run(scenario())
+
+def test_cancelling_one_caller_keeps_the_flight_for_the_others():
+    async def scenario():
+        flight = SingleFlight('test')
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 'row'
+
+        first = asyncio.ensure_future(flight.do('key', fetch))
+        second = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == 'row'
+        assert first.cancelled()
+
+    asyncio.run(scenario())
+
+def test_flight_is_cancelled_once_every_caller_is_gone():
+    async def scenario():
+        flight = SingleFlight('test')
+        started = asyncio.Event()
+        cancelled = []
+
+        async def fetch():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        caller = asyncio.ensure_future(flight.do('key', fetch))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        assert cancelled == [1]
+        assert flight.snapshot()['in_flight'] == 0
+        assert flight.cancelled == 1
+
+    asyncio.run(scenario())
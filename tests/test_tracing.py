@@ -0,0 +1,42 @@
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import tracing
+
+@pytest.fixture
+def trace_log(tmp_path, monkeypatch):
+    path = tmp_path / "trace.log"
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(path))
+    monkeypatch.setattr(tracing, "_trace_log", None)
+    yield path
+    trace_logger = logging.getLogger("app.trace")
+    for handler in list(trace_logger.handlers):
+        trace_logger.removeHandler(handler)
+        handler.close()
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+def test_traced_request_returns_server_timing_and_logs_spans(cassandra_session, trace_log):
+    response = TestClient(app).get("/api/messages/conversation/7", headers={'X-Trace': '1'})
+    assert response.status_code == 200, response.text
+    timing = response.headers['server-timing']
+    for name in ('admission_wait', 'cassandra', 'fetch', 'build', 'total'):
+        assert f"{name};dur=" in timing
+    # messages, read receipts and the message counter: one aggregated entry with its count
+    assert 'cassandra;dur=' in timing and 'desc="3x"' in timing
+
+    (entry,) = _lines(trace_log)
+    assert entry['path'] == "/api/messages/conversation/7" and entry['status'] == 200
+    queries = [span['query'] for span in entry['spans'] if span['name'] == 'cassandra']
+    assert any(query.startswith("SELECT * FROM messages") for query in queries)
+
+def test_untraced_request_has_no_timing_and_no_log(cassandra_session, trace_log):
+    response = TestClient(app).get("/api/messages/conversation/7")
+    assert response.status_code == 200, response.text
+    assert 'server-timing' not in response.headers
+    assert _lines(trace_log) == []